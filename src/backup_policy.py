@@ -0,0 +1,183 @@
+"""
+备份策略：保存数据文件前留存旧版本的快照
+
+- 间隔：距上一次备份不足 interval 秒时不备份
+- 去重：内容与最近一次备份相同时不保留
+- 保留：只保留最近 keep 份，并删除超过 max_age_days 天的备份（最新一份始终保留）
+- 快照：优先硬链接，其次 reflink（写时复制，需文件系统支持），都不支持时才复制
+
+硬链接快照依赖调用方以"写临时文件再原子替换"的方式更新数据文件：被替换下来的旧文件
+不会再被修改，链接到备份目录后即是一份完整快照。快照本身在保存线程中完成（链接为 O(1)），
+计算摘要、去重、复制和清理旧备份都在后台线程中进行，不增加保存耗时
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支持 reflink
+    fcntl = None
+
+_FICLONE = 0x40049409  # Linux ioctl：reflink 整个文件（btrfs / xfs 等）
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """尝试以 reflink 方式复制文件，不支持时返回 False"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BackupPolicy:
+    """数据文件的备份策略（线程安全）"""
+
+    def __init__(self, backup_dir: str, prefix: str = 'backup_', suffix: str = '.jsonl',
+                 interval: float = 300, keep: int = 20, max_age_days: float = 7,
+                 background: bool = True):
+        """
+        Args:
+            backup_dir: 备份目录
+            prefix / suffix: 备份文件名的前缀和后缀（清理时只处理匹配的文件）
+            interval: 两次备份之间的最小间隔（秒），0 表示每次保存都备份
+            keep: 最多保留的备份数，0 表示不限
+            max_age_days: 备份的最长保留天数，0 表示不限
+            background: 是否在后台线程中去重、复制和清理
+        """
+        self.backup_dir = backup_dir
+        self.prefix = prefix
+        self.suffix = suffix
+        self.interval = interval
+        self.keep = keep
+        self.max_age_days = max_age_days
+        self._last_time = 0.0  # 最近一次备份的时间（time.monotonic）
+        self._last_digest: Optional[str] = None  # 最近一次备份的内容摘要
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup") if background else None
+
+    def snapshot(self, path: str) -> bool:
+        """
+        在 path 被替换前调用：按策略为其当前内容留存快照
+
+        Returns:
+            是否发起了备份（间隔未到或文件不存在时返回 False）
+        """
+        if not os.path.exists(path):
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if self._last_time and now - self._last_time < self.interval:
+                return False
+            self._last_time = now
+
+            os.makedirs(self.backup_dir, exist_ok=True)
+            target = self._new_name()
+            pending = f"{target}.pending"
+            if self._link(path, pending):
+                source = pending
+            else:
+                # 无法在替换前留下快照：打开旧文件，替换后仍可从句柄中读取原内容
+                source = open(path, 'rb')
+
+        try:
+            if self._executor is not None:
+                self._executor.submit(self._finish, source, pending, target)
+                return True
+        except RuntimeError:
+            pass  # 解释器退出时（atexit 中压缩）线程池已关闭，改为同步完成
+        self._finish(source, pending, target)
+        return True
+
+    def flush(self):
+        """等待已提交的备份完成"""
+        if self._executor is not None:
+            self._executor.submit(lambda: None).result()
+
+    def _new_name(self) -> str:
+        # 精确到微秒：同一秒内的多份备份也按时间排序（被清理后的文件名不会被重用而打乱顺序）
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        target = os.path.join(self.backup_dir, f"{self.prefix}{ts}{self.suffix}")
+        n = 1
+        while os.path.exists(target) or os.path.exists(f"{target}.pending"):
+            target = os.path.join(self.backup_dir, f"{self.prefix}{ts}_{n}{self.suffix}")
+            n += 1
+        return target
+
+    @staticmethod
+    def _link(src: str, dst: str) -> bool:
+        """硬链接或 reflink（都是 O(1)，不复制数据）"""
+        try:
+            os.link(src, dst)
+            return True
+        except (OSError, AttributeError):
+            return _reflink(src, dst)
+
+    def _finish(self, source, pending: str, target: str):
+        """去重、落盘并清理旧备份（后台线程）"""
+        try:
+            if not isinstance(source, str):
+                with source:
+                    with open(pending, 'wb') as out:
+                        shutil.copyfileobj(source, out, 1024 * 1024)
+
+            digest = _file_digest(pending)
+            if self._last_digest is None:
+                latest = self.backups()
+                self._last_digest = _file_digest(latest[-1]) if latest else ''
+            if digest == self._last_digest:
+                os.remove(pending)
+                return
+            os.replace(pending, target)
+            self._last_digest = digest
+            self.prune()
+        except OSError as e:
+            print(f"⚠️  备份失败: {e}")
+            if os.path.exists(pending):
+                os.remove(pending)
+
+    def backups(self) -> List[str]:
+        """已有的备份文件，按时间从旧到新"""
+        try:
+            names = os.listdir(self.backup_dir)
+        except OSError:
+            return []
+        paths = [os.path.join(self.backup_dir, name) for name in names
+                 if name.startswith(self.prefix) and name.endswith(self.suffix)]
+        return sorted(paths)  # 文件名中的时间戳即备份时间
+
+    def prune(self):
+        """按数量和天数删除旧备份（最新一份始终保留）"""
+        paths = self.backups()
+        expired = []
+        if self.keep and len(paths) > self.keep:
+            expired = paths[:-self.keep]
+            paths = paths[-self.keep:]
+        if self.max_age_days:
+            cutoff = (datetime.now() - timedelta(days=self.max_age_days)).timestamp()
+            expired += [p for p in paths[:-1] if os.path.getmtime(p) < cutoff]
+        for p in expired:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
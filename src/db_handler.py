@@ -3,31 +3,56 @@
 """
 
 import json
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from sqlalchemy import case, func, or_, select, union_all, update
 from sqlalchemy.exc import IntegrityError
-from .db_models import Annotation, get_session, init_database
+from sqlalchemy.orm import scoped_session, sessionmaker
+from .db_models import Annotation, get_engine, init_database
 
 
 class DatabaseHandler:
     """数据库处理类"""
     
-    def __init__(self, db_path: str = 'databases/annotation.db'):
+    def __init__(self, db_path: str = 'databases/annotation.db', pool_size: int = 5, max_overflow: int = 10,
+                 pragmas: Optional[Dict[str, Any]] = None, lease_minutes: float = 0):
         """
         初始化数据库处理器
         
+        引擎（连接池）在所有请求间共享；每次调用使用独立的短生命周期 session，
+        多个用户的请求可以并发执行，互不阻塞
+        
         Args:
             db_path: 数据库文件路径
+            pool_size: 连接池常驻连接数
+            max_overflow: 连接池允许的额外连接数
+            pragmas: SQLite 连接参数覆盖项（见 db_models.DEFAULT_SQLITE_PRAGMAS）
+            lease_minutes: 浏览即占有的租约时长（分钟），0 表示永久占有
         """
         self.db_path = db_path
+        self.lease_minutes = lease_minutes
         # 初始化数据库
-        init_database(db_path)
-        self.session = get_session(db_path)
+        init_database(db_path, pragmas=pragmas)
+        self.engine = get_engine(db_path, pool_size=pool_size, max_overflow=max_overflow, pragmas=pragmas)
+        # 提交后不过期对象属性，返回给调用方的对象在 session 关闭后仍可读取
+        self.Session = scoped_session(sessionmaker(bind=self.engine, expire_on_commit=False))
+    
+    @contextmanager
+    def session_scope(self):
+        """获取当前线程的 session，结束后归还连接"""
+        session = self.Session()
+        try:
+            yield session
+        finally:
+            self.Session.remove()
     
     def load_data(self) -> Dict[str, Annotation]:
         """加载所有数据"""
         try:
-            annotations = self.session.query(Annotation).all()
-            return {ann.model_id: ann for ann in annotations}
+            with self.session_scope() as session:
+                annotations = session.query(Annotation).all()
+                return {ann.model_id: ann for ann in annotations}
         except Exception as e:
             print(f"❌ 加载数据失败: {e}")
             return {}
@@ -43,12 +68,84 @@ class DatabaseHandler:
             Annotation对象或None
         """
         try:
-            annotation = self.session.query(Annotation).filter_by(model_id=model_id).first()
-            return annotation
+            with self.session_scope() as session:
+                return session.query(Annotation).filter_by(model_id=model_id).first()
         except Exception as e:
             print(f"❌ 加载数据项失败: {model_id} - {e}")
             return None
             
+    # ========================
+    # 分页导航查询（不加载全部数据）
+    # ========================
+    
+    def _visible_select(self, uid: str, after: str = None, before: str = None):
+        """
+        用户可见记录的 model_id 查询
+        
+        未分配池和该用户的记录各自走 (uid, model_id) 索引，再用 UNION ALL 合并，
+        按 model_id 排序时 SQLite 直接归并两个有序结果，不需要临时排序
+        """
+        selects = []
+        for owner in ([''] if not uid else ['', uid]):
+            stmt = select(Annotation.model_id).where(Annotation.uid == owner)
+            if after is not None:
+                stmt = stmt.where(Annotation.model_id > after)
+            if before is not None:
+                stmt = stmt.where(Annotation.model_id < before)
+            selects.append(stmt)
+        return (selects[0] if len(selects) == 1 else union_all(*selects)).subquery()
+    
+    def count_all(self) -> int:
+        """记录总数"""
+        with self.session_scope() as session:
+            return session.execute(select(func.count()).select_from(Annotation)).scalar_one()
+    
+    def count_visible(self, uid: str, before: str = None) -> int:
+        """
+        用户可见的记录数
+        
+        Args:
+            uid: 用户ID
+            before: 只统计 model_id 小于该值的记录（即该记录在可见列表中的下标）
+        """
+        sub = self._visible_select(uid, before=before)
+        with self.session_scope() as session:
+            return session.execute(select(func.count()).select_from(sub)).scalar_one()
+    
+    def visible_keys(self, uid: str, after: str = None, before: str = None, offset: int = 0,
+                     limit: Optional[int] = None, descending: bool = False) -> List[str]:
+        """
+        按 model_id 顺序返回用户可见的一页记录键（keyset 分页）
+        
+        Args:
+            uid: 用户ID
+            after: 只返回 model_id 大于该值的记录（向后翻页）
+            before: 只返回 model_id 小于该值的记录（向前翻页，配合 descending=True）
+            offset: 跳过的记录数（只在随机跳转时使用）
+            limit: 最多返回的记录数，None 表示不限
+            descending: 是否按 model_id 倒序
+        """
+        sub = self._visible_select(uid, after=after, before=before)
+        order = sub.c.model_id.desc() if descending else sub.c.model_id
+        stmt = select(sub.c.model_id).order_by(order).offset(offset).limit(limit)
+        with self.session_scope() as session:
+            return list(session.execute(stmt).scalars())
+    
+    def get_owner(self, model_id: str) -> Optional[str]:
+        """返回记录的占有者（'' 表示未分配，None 表示不存在）"""
+        with self.session_scope() as session:
+            uid = session.execute(
+                select(Annotation.uid).where(Annotation.model_id == model_id)
+            ).first()
+        return None if uid is None else (uid[0] or '')
+    
+    def first_key(self) -> Optional[str]:
+        """按 model_id 顺序的第一条记录键"""
+        with self.session_scope() as session:
+            return session.execute(
+                select(Annotation.model_id).order_by(Annotation.model_id).limit(1)
+            ).scalar_one_or_none()
+    
     def parse_item(self, item: Annotation) -> Dict:
         """解析单条数据"""
         if isinstance(item, Annotation):
@@ -56,11 +153,28 @@ class DatabaseHandler:
             return result
         return {}
         
+    def _claim_values(self, uid: str) -> Dict[str, Any]:
+        """占有时写入的字段：uid、占有时间，启用租约时还包括未标注数据的租约到期时间"""
+        now = datetime.now()
+        values = {
+            'uid': uid,
+            # 重复占有时保留原占有时间
+            'claimed_at': case((Annotation.uid == '', now), else_=func.coalesce(Annotation.claimed_at, now)),
+        }
+        if self.lease_minutes:
+            values['lease_expiry'] = case(
+                (Annotation.annotated == False, now + timedelta(minutes=self.lease_minutes)),
+                else_=None,
+            )
+        return values
+    
     def assign_to_user(self, model_id: str, uid: str):
         """
         仅分配数据给用户（浏览即占有）
         
-        只更新 uid 字段，不触碰其他任何数据
+        只更新 uid 和租约字段，不触碰其他任何数据。
+        占有检查和更新在同一条条件 UPDATE 中完成，多个进程共用数据库时也不会互相覆盖
+        启用租约时，未标注的数据在租约到期后会被收回（见 release_expired_leases）
         
         Args:
             model_id: 模型ID
@@ -69,29 +183,116 @@ class DatabaseHandler:
         Returns:
             bool: 是否成功分配
         """
-        try:
-            # 使用数据库锁确保原子操作
-            annotation = self.session.query(Annotation).filter_by(model_id=model_id).with_for_update().first()
-            if not annotation:
+        stmt = (
+            update(Annotation)
+            .where(Annotation.model_id == model_id)
+            .where(or_(Annotation.uid == '', Annotation.uid == uid))
+            .values(**self._claim_values(uid))
+        )
+        with self.session_scope() as session:
+            try:
+                claimed = session.execute(stmt).rowcount > 0
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"❌ 分配失败: {e}")
                 return False
-                
-            # 检查是否已被其他用户占有
-            current_uid = annotation.uid
-            if current_uid and current_uid != uid and current_uid != '':
+        
+        if not claimed:
+            current_uid = self.get_owner(model_id)
+            if current_uid:
                 # 已被其他用户占有，不允许覆盖
-                self.session.rollback()  # 释放锁
                 print(f"⚠️ 数据已被用户 '{current_uid}' 占有，无法分配给 '{uid}'")
-                return False
-            
-            # 未被占有或被当前用户占有，可以更新
-            annotation.uid = uid
-            self.session.commit()
-            return True
+        return claimed
+    
+    def claim_next_unowned(self, uid: str, n: int = 1) -> List[str]:
+        """
+        一次性为用户占有接下来的 n 条未分配数据（按 model_id 顺序）
+        
+        Args:
+            uid: 用户ID
+            n: 占有数量
             
-        except Exception as e:
-            self.session.rollback()
-            print(f"❌ 分配失败: {e}")
+        Returns:
+            List[str]: 实际占有的 model_id 列表（可能少于 n）
+        """
+        candidates = (
+            select(Annotation.model_id)
+            .where(Annotation.uid == '')
+            .order_by(Annotation.model_id)
+            .limit(n)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Annotation)
+            .where(Annotation.model_id.in_(candidates))
+            .where(Annotation.uid == '')
+            .values(**self._claim_values(uid))
+            .returning(Annotation.model_id)
+        )
+        with self.session_scope() as session:
+            try:
+                claimed = list(session.execute(stmt).scalars())
+                session.commit()
+                return sorted(claimed)
+            except Exception as e:
+                session.rollback()
+                print(f"❌ 批量分配失败: {e}")
+                return []
+    
+    def renew_lease(self, model_id: str, uid: str) -> bool:
+        """
+        续租（心跳）：延长用户正在查看的未标注数据的租约
+        
+        只续租已有租约的数据，永久占有的数据保持不变；不修改 updated_at
+        
+        Returns:
+            bool: 是否续租成功
+        """
+        if not self.lease_minutes:
             return False
+        stmt = (
+            update(Annotation)
+            .where(Annotation.model_id == model_id)
+            .where(Annotation.uid == uid)
+            .where(Annotation.annotated == False)
+            .where(Annotation.lease_expiry.isnot(None))
+            .values(lease_expiry=datetime.now() + timedelta(minutes=self.lease_minutes),
+                    updated_at=Annotation.updated_at)
+        )
+        with self.session_scope() as session:
+            try:
+                renewed = session.execute(stmt).rowcount > 0
+                session.commit()
+                return renewed
+            except Exception as e:
+                session.rollback()
+                print(f"❌ 续租失败: {model_id} - {e}")
+                return False
+    
+    def release_expired_leases(self) -> List[str]:
+        """
+        收回租约已到期且仍未标注的数据，退回未分配池
+        
+        Returns:
+            List[str]: 被收回的 model_id 列表
+        """
+        stmt = (
+            update(Annotation)
+            .where(Annotation.annotated == False)
+            .where(Annotation.lease_expiry < datetime.now())
+            .values(uid='', claimed_at=None, lease_expiry=None, updated_at=Annotation.updated_at)
+            .returning(Annotation.model_id)
+        )
+        with self.session_scope() as session:
+            try:
+                released = list(session.execute(stmt).scalars())
+                session.commit()
+                return released
+            except Exception as e:
+                session.rollback()
+                print(f"❌ 收回过期租约失败: {e}")
+                return []
     
     def save_item(self, model_id: str, data: Dict, score: int = 1, uid: str = None):
         """
@@ -112,74 +313,76 @@ class DatabaseHandler:
                     "model_id": "已保存的模型ID"(成功时)
                 }
         """
-        try:
-            annotation = self.session.query(Annotation).filter_by(model_id=model_id).first()
+        with self.session_scope() as session:
+            try:
+                annotation = session.query(Annotation).filter_by(model_id=model_id).first()
             
-            if not annotation:
-                # 记录不存在
-                return {
-                    "success": False,
-                    "error": "NOT_FOUND",
-                    "message": f"未找到ID为 {model_id} 的记录"
-                }
+                if not annotation:
+                    # 记录不存在
+                    return {
+                        "success": False,
+                        "error": "NOT_FOUND",
+                        "message": f"未找到ID为 {model_id} 的记录"
+                    }
                 
-            # 获取旧数据（不复制，只用于比较）
-            old_data = annotation.data if annotation.data else {}
+                # 获取旧数据（不复制，只用于比较）
+                old_data = annotation.data if annotation.data else {}
             
-            # 从表单提交的数据中排除元数据字段
-            update_data = {k: v for k, v in data.items() if k not in ['uid', 'annotated', 'score', 'modified']}
+                # 从表单提交的数据中排除元数据字段
+                update_data = {k: v for k, v in data.items() if k not in ['uid', 'annotated', 'score', 'modified']}
             
-            # 快速检查是否有变化（只检查更新的字段）
-            data_changed = False
-            for key, new_value in update_data.items():
-                old_value = old_data.get(key)
-                # 深度比较（处理列表、字典等嵌套结构）
-                if old_value != new_value:
-                    data_changed = True
-                    break
+                # 快速检查是否有变化（只检查更新的字段）
+                data_changed = False
+                for key, new_value in update_data.items():
+                    old_value = old_data.get(key)
+                    # 深度比较（处理列表、字典等嵌套结构）
+                    if old_value != new_value:
+                        data_changed = True
+                        break
             
-            # 如果旧数据为空但新数据不为空，也算有变化
-            if not data_changed and not old_data and update_data:
-                data_changed = True
+                # 如果旧数据为空但新数据不为空，也算有变化
+                if not data_changed and not old_data and update_data:
+                    data_changed = True
             
-            # 创建新数据（必须创建新对象，确保SQLAlchemy能追踪变更）
-            # 即使内容相同，也要创建新对象
-            new_data = old_data.copy() if old_data else {}
-            new_data.update(update_data)
+                # 创建新数据（必须创建新对象，确保SQLAlchemy能追踪变更）
+                # 即使内容相同，也要创建新对象
+                new_data = old_data.copy() if old_data else {}
+                new_data.update(update_data)
             
-            # 更新标注状态和数据
-            annotation.annotated = True  # 保存即标记为已标注
-            annotation.uid = uid if uid else annotation.uid
-            annotation.score = score
-            annotation.modified = data_changed  # 标记是否被修改
-            annotation.data = new_data  # 总是赋值新对象，确保ORM追踪变更
+                # 更新标注状态和数据
+                annotation.annotated = True  # 保存即标记为已标注
+                annotation.uid = uid if uid else annotation.uid
+                annotation.score = score
+                annotation.modified = data_changed  # 标记是否被修改
+                annotation.data = new_data  # 总是赋值新对象，确保ORM追踪变更
+                annotation.lease_expiry = None  # 标注后转为永久占有
             
-            self.session.commit()
-            return {
-                "success": True,
-                "message": f"成功保存记录 {model_id}",
-                "model_id": model_id
-            }
+                session.commit()
+                return {
+                    "success": True,
+                    "message": f"成功保存记录 {model_id}",
+                    "model_id": model_id
+                }
             
-        except IntegrityError as e:
-            self.session.rollback()
-            error_message = str(e)
-            print(f"❌ 保存失败(数据完整性错误): {error_message}")
-            return {
-                "success": False,
-                "error": "INTEGRITY_ERROR",
-                "message": "数据冲突，请检查输入"
-            }
+            except IntegrityError as e:
+                session.rollback()
+                error_message = str(e)
+                print(f"❌ 保存失败(数据完整性错误): {error_message}")
+                return {
+                    "success": False,
+                    "error": "INTEGRITY_ERROR",
+                    "message": "数据冲突，请检查输入"
+                }
             
-        except Exception as e:
-            self.session.rollback()
-            error_message = str(e)
-            print(f"❌ 保存失败: {error_message}")
-            return {
-                "success": False,
-                "error": "UNKNOWN_ERROR",
-                "message": error_message
-            }
+            except Exception as e:
+                session.rollback()
+                error_message = str(e)
+                print(f"❌ 保存失败: {error_message}")
+                return {
+                    "success": False,
+                    "error": "UNKNOWN_ERROR",
+                    "message": error_message
+                }
     
     def export_to_jsonl(self, output_dir: str = "exports", filter_by_user=None, only_annotated=False) -> str:
         """
@@ -228,58 +431,59 @@ class DatabaseHandler:
         filename = f"{task_name}_{timestamp}.jsonl"
         filepath = os.path.join(output_dir, filename)
         
-        try:
-            # 构建查询
-            query = self.session.query(Annotation)
+        with self.session_scope() as session:
+            try:
+                # 构建查询
+                query = session.query(Annotation)
             
-            # 应用过滤条件
-            if filter_by_user:
-                query = query.filter_by(uid=filter_by_user)
+                # 应用过滤条件
+                if filter_by_user:
+                    query = query.filter_by(uid=filter_by_user)
             
-            if only_annotated:
-                query = query.filter_by(annotated=True)
+                if only_annotated:
+                    query = query.filter_by(annotated=True)
             
-            annotations = query.all()
+                annotations = query.all()
             
-            # 写入JSONL文件
-            with open(filepath, 'w', encoding='utf-8') as f:
-                for ann in annotations:
-                    # 构建完整数据（包含元数据和业务数据）
-                    # 这是导出过程的核心，确保数据的纯粹性
-                    full_data = {
-                        'annotated': ann.annotated,
-                        'uid': ann.uid,
-                        'score': ann.score,
-                        'modified': ann.modified,
-                    }
+                # 写入JSONL文件
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    for ann in annotations:
+                        # 构建完整数据（包含元数据和业务数据）
+                        # 这是导出过程的核心，确保数据的纯粹性
+                        full_data = {
+                            'annotated': ann.annotated,
+                            'uid': ann.uid,
+                            'score': ann.score,
+                            'modified': ann.modified,
+                        }
                     
-                    # 直接合并数据库中存储的业务数据，不做任何转换
-                    if ann.data:
-                        full_data.update(ann.data)
+                        # 直接合并数据库中存储的业务数据，不做任何转换
+                        if ann.data:
+                            full_data.update(ann.data)
                     
-                    # 移除所有特殊字段处理，保持数据原样
+                        # 移除所有特殊字段处理，保持数据原样
                     
-                    # 写入 JSONL 格式：{"model_id": {数据}}
-                    line_obj = {ann.model_id: full_data}
-                    f.write(json.dumps(line_obj, ensure_ascii=False) + '\n')
+                        # 写入 JSONL 格式：{"model_id": {数据}}
+                        line_obj = {ann.model_id: full_data}
+                        f.write(json.dumps(line_obj, ensure_ascii=False) + '\n')
             
-            # 返回绝对路径
-            abs_filepath = os.path.abspath(filepath)
-            print(f"✅ 导出完成: {abs_filepath}")
-            print(f"   共导出 {len(annotations)} 条记录")
-            return abs_filepath
+                # 返回绝对路径
+                abs_filepath = os.path.abspath(filepath)
+                print(f"✅ 导出完成: {abs_filepath}")
+                print(f"   共导出 {len(annotations)} 条记录")
+                return abs_filepath
             
-        except PermissionError as e:
-            error_msg = f"写入文件 '{filepath}' 权限被拒绝"
-            print(f"❌ {error_msg}")
-            raise PermissionError(error_msg) from e
+            except PermissionError as e:
+                error_msg = f"写入文件 '{filepath}' 权限被拒绝"
+                print(f"❌ {error_msg}")
+                raise PermissionError(error_msg) from e
             
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ 导出失败: {error_msg}")
-            raise
+            except Exception as e:
+                error_msg = str(e)
+                print(f"❌ 导出失败: {error_msg}")
+                raise
     
     def close(self):
         """关闭数据库连接"""
-        if hasattr(self, 'session'):
-            self.session.close()
+        self.Session.remove()
+        self.engine.dispose()
@@ -7,7 +7,7 @@
 - 不再依赖 db_config.py
 """
 
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, Text, DateTime, Float, JSON, inspect, text
+from sqlalchemy import create_engine, event, Column, String, Integer, Boolean, Text, DateTime, Float, JSON, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -36,10 +36,25 @@ class Annotation(Base):
     # 业务数据（JSON格式，存储所有字段）
     data = Column(JSON, default={}, comment='业务数据JSON')
     
+    # 导入时源数据（元数据 + 业务数据）的内容哈希，增量导入时跳过内容未变化的记录
+    content_hash = Column(String(40), nullable=True, comment='源数据内容哈希')
+    
+    # 租约（浏览即占有的临时占有；为空表示永久占有）
+    claimed_at = Column(DateTime, nullable=True, comment='占有时间')
+    lease_expiry = Column(DateTime, nullable=True, comment='租约到期时间')
+    
     # 时间戳
     created_at = Column(DateTime, default=datetime.now, comment='创建时间')
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
     
+    # 二级索引（按用户可见性、标注状态查询和统计时走索引范围扫描）
+    __table_args__ = (
+        Index('ix_annotations_uid_annotated', 'uid', 'annotated'),
+        Index('ix_annotations_annotated_updated_at', 'annotated', 'updated_at'),
+        Index('ix_annotations_uid_model_id', 'uid', 'model_id'),
+        Index('ix_annotations_annotated_lease_expiry', 'annotated', 'lease_expiry'),
+    )
+    
     def to_dict(self):
         """
         转换为字典格式
@@ -62,18 +77,53 @@ class Annotation(Base):
     
 
 
+class ImportCheckpoint(Base):
+    """
+    导入断点表：记录每个数据源最后一次提交到的位置，供 --resume 续传
+    
+    与导入的数据在同一事务中更新，断点之前的数据一定已经落库
+    """
+    __tablename__ = 'import_checkpoints'
+    
+    source = Column(String(1024), primary_key=True, comment='数据源绝对路径')
+    size = Column(Integer, nullable=False, comment='导入时的文件大小（字节）')
+    mtime = Column(Float, nullable=False, comment='导入时的文件修改时间')
+    offset = Column(Integer, default=0, nullable=False, comment='最后提交的字节偏移（下一行行首）')
+    line = Column(Integer, default=0, nullable=False, comment='最后提交的行号')
+    completed = Column(Boolean, default=False, nullable=False, comment='是否已导入完成')
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+
 
 # ========================
 # 数据库引擎和会话
 # ========================
 
-def get_engine(db_path: str = None):
+# SQLite 连接参数（每个新连接建立时执行），任务可在 UI 配置的 DATABASE_CONFIG["pragmas"] 中覆盖
+# - WAL：读不阻塞写，多人同时保存、导出时互不等待（数据库文件不要放在网络文件系统上）
+# - synchronous=NORMAL：WAL 模式下只在检查点 fsync，断电最多丢失最近的提交，不会损坏数据库
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,       # 页缓存 64MB（负数单位为 KB）
+    "mmap_size": 268435456,     # 内存映射 256MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 10000,      # 遇到写锁时最多等待 10 秒
+}
+
+
+def get_engine(db_path: str = None, pool_size: int = 5, max_overflow: int = 10, pragmas: dict = None):
     """
     获取数据库引擎
     
+    引擎是线程安全的连接池，可在多个线程间共享；
+    每个线程/请求应使用自己的短生命周期 session
+    
     Args:
         db_path: 数据库文件路径（如 "databases/annotation.db"）
                 如果为None，使用默认路径 "annotations.db"
+        pool_size: 连接池常驻连接数
+        max_overflow: 连接池允许的额外连接数
+        pragmas: 覆盖 DEFAULT_SQLITE_PRAGMAS 的项（值为 None 表示不设置该项）
     
     Returns:
         SQLAlchemy engine对象
@@ -86,9 +136,29 @@ def get_engine(db_path: str = None):
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir, exist_ok=True)
     
-    # 创建引擎
+    # 创建引擎（连接可在线程间传递，由连接池保证同一时刻只被一个线程使用）
     db_url = f"sqlite:///{db_path}"
-    return create_engine(db_url, echo=False)
+    engine = create_engine(
+        db_url,
+        echo=False,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        connect_args={'check_same_thread': False},
+    )
+    
+    settings = {**DEFAULT_SQLITE_PRAGMAS, **(pragmas or {})}
+    
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in settings.items():
+                if value is not None:
+                    cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    
+    return engine
 
 
 def get_session(db_path: str = None):
@@ -106,14 +176,15 @@ def get_session(db_path: str = None):
     return Session()
 
 
-def migrate_database(db_path: str = None):
+def migrate_database(db_path: str = None, pragmas: dict = None):
     """
     迁移数据库：为现有表添加缺失的列（参考 score 的处理方式）
     
     Args:
         db_path: 数据库文件路径
+        pragmas: SQLite 连接参数覆盖项
     """
-    engine = get_engine(db_path)
+    engine = get_engine(db_path, pragmas=pragmas)
     
     # 检查表是否存在
     inspector = inspect(engine)
@@ -133,20 +204,57 @@ def migrate_database(db_path: str = None):
                 except Exception as e:
                     print(f"⚠️  添加 modified 列时出错: {e}")
                     conn.rollback()
+            
+            # 租约列（可为空，旧数据保持永久占有）
+            for column in ('claimed_at', 'lease_expiry'):
+                if column not in columns:
+                    try:
+                        conn.execute(text(f"ALTER TABLE annotations ADD COLUMN {column} DATETIME"))
+                        conn.commit()
+                        print(f"✅ 已添加 {column} 列到数据库: {db_path or 'annotations.db'}")
+                    except Exception as e:
+                        print(f"⚠️  添加 {column} 列时出错: {e}")
+                        conn.rollback()
+            
+            # 内容哈希列（旧数据为空，下次增量导入时按内容变化处理一次）
+            if 'content_hash' not in columns:
+                try:
+                    conn.execute(text("ALTER TABLE annotations ADD COLUMN content_hash VARCHAR(40)"))
+                    conn.commit()
+                    print(f"✅ 已添加 content_hash 列到数据库: {db_path or 'annotations.db'}")
+                except Exception as e:
+                    print(f"⚠️  添加 content_hash 列时出错: {e}")
+                    conn.rollback()
+        
+        # 检查并创建缺失的索引（旧数据库只有主键）
+        existing_indexes = {idx['name'] for idx in inspector.get_indexes('annotations')}
+        for index in Annotation.__table__.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                with engine.begin() as conn:
+                    index.create(conn, checkfirst=True)
+                print(f"✅ 已创建索引 {index.name}: {db_path or 'annotations.db'}")
+            except Exception as e:
+                print(f"⚠️  创建索引 {index.name} 时出错: {e}")
+    
+    engine.dispose()
 
 
-def init_database(db_path: str = None):
+def init_database(db_path: str = None, pragmas: dict = None):
     """
     初始化数据库（创建所有表，并迁移现有表）
     
     Args:
         db_path: 数据库文件路径
+        pragmas: SQLite 连接参数覆盖项
     """
-    engine = get_engine(db_path)
+    engine = get_engine(db_path, pragmas=pragmas)
     Base.metadata.create_all(engine)
+    engine.dispose()
     
     # 迁移现有数据库（添加缺失的列，参考 score 的处理方式）
-    migrate_database(db_path)
+    migrate_database(db_path, pragmas=pragmas)
     
     print(f"✅ 数据库初始化完成: {db_path or 'annotations.db'}")
 
@@ -0,0 +1,179 @@
+"""
+图片缓存：为图片组件生成缩小、重新压缩后的显示版本
+
+- 缓存键：源文件路径 + 修改时间 + 文件大小 + 目标尺寸 + 输出格式
+- 输出格式：WebP（Pillow 不支持 WebP 时退回 JPEG）
+- 淘汰策略：按最近使用时间（文件 mtime，命中时刷新）的 LRU，总大小有上限
+- Pillow 不可用或处理失败时，直接返回原图路径
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Optional
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+    features = None
+
+
+class ImageCache:
+    """图片显示尺寸缓存"""
+
+    def __init__(self, cache_dir: str, max_size: int = 1024, quality: int = 85,
+                 max_bytes: int = 2 * 1024 ** 3):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_size: 显示版本的最长边（像素）
+            quality: 压缩质量（1-100）
+            max_bytes: 缓存目录总大小上限（字节），超出后按 LRU 淘汰
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.enabled = Image is not None
+
+        if not self.enabled:
+            print("⚠️  未安装 Pillow，图片缓存已禁用（将直接使用原图）")
+            return
+
+        if features.check('webp'):
+            self.format, self.ext = 'WEBP', '.webp'
+        else:
+            self.format, self.ext = 'JPEG', '.jpg'
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_bytes = sum(size for _, _, size in self._scan())
+
+    def _scan(self):
+        """列出缓存文件: [(mtime, path, size)]"""
+        entries = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            with os.scandir(sub.path) as it:
+                for entry in it:
+                    if entry.name.endswith(self.ext):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, entry.path, st.st_size))
+        return entries
+
+    def cache_path(self, src_path: str, st: os.stat_result, max_size: int) -> str:
+        """计算缓存文件路径（源文件变化或参数变化都会得到新的键）"""
+        key = f"{os.path.abspath(src_path)}|{st.st_mtime_ns}|{st.st_size}|{max_size}|{self.format}|{self.quality}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + self.ext)
+
+    def get(self, src_path: str, max_size: Optional[int] = None,
+            st: Optional[os.stat_result] = None) -> Optional[str]:
+        """
+        获取图片的显示版本
+
+        Args:
+            src_path: 原图路径
+            max_size: 最长边，默认使用实例配置
+            st: 已知的原图 stat 结果（如来自路径状态缓存），为空时自行 stat
+
+        Returns:
+            缓存文件路径；缓存不可用时返回原图路径；原图不存在返回 None
+        """
+        if st is None:
+            try:
+                st = os.stat(src_path)
+            except OSError:
+                return None
+
+        if not self.enabled:
+            return src_path
+
+        dst = self.cache_path(src_path, st, max_size or self.max_size)
+        try:
+            # 命中：刷新 mtime 作为 LRU 时间戳
+            os.utime(dst)
+            return dst
+        except OSError:
+            pass
+
+        try:
+            size = self._generate(src_path, dst, max_size or self.max_size)
+        except Exception as e:
+            print(f"⚠️ 生成缩略图失败，使用原图: {src_path} - {e}")
+            return src_path
+
+        with self._lock:
+            self._total_bytes += size
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+        return dst
+
+    def _generate(self, src_path: str, dst: str, max_size: int) -> int:
+        """生成缩略图（先写临时文件再原子替换），返回文件大小"""
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(src_path) as img:
+                img.draft('RGB', (max_size, max_size))  # JPEG 源可直接按缩小尺寸解码
+                img.thumbnail((max_size, max_size))
+                if self.format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                elif img.mode not in ('RGB', 'RGBA', 'L'):
+                    img = img.convert('RGBA')
+                img.save(tmp, self.format, quality=self.quality)
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return os.path.getsize(dst)
+
+    def evict(self):
+        """按 LRU 淘汰缓存文件，直到总大小降到上限的 90% 以下"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, _, size in entries)
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for _, path, size in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            self._total_bytes = total
+        if removed:
+            print(f"🧹 图片缓存淘汰 {removed} 个文件，当前 {total / 1024 ** 2:.1f} MB")
+
+    def warm(self, paths: Iterable[str], workers: int = 8) -> dict:
+        """
+        批量预生成缩略图
+
+        Returns:
+            {'cached': 成功数, 'missing': 原图不存在数}
+        """
+        stats = {'cached': 0, 'missing': 0}
+        paths = iter(paths)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # 分批提交，避免一次性展开全部路径
+                batch = list(islice(paths, 1000))
+                if not batch:
+                    break
+                for result in executor.map(self.get, batch):
+                    if result is None:
+                        stats['missing'] += 1
+                    else:
+                        stats['cached'] += 1
+                print(f"  已处理 {stats['cached'] + stats['missing']} 张...")
+        return stats
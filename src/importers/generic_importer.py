@@ -26,20 +26,79 @@
     
     # 分配所有任务（包括已分配的）
     python -m importers.generic_importer --task annotation --assign an1 an2 an3 --assign-all
+    
+    # 按权重分配（an1 分到的任务是 an2 的两倍），只打印分配方案
+    python -m importers.generic_importer --task annotation --assign an1:2 an2 --dry-run
+    
+    # 导入后检查图片路径
+    python -m importers.generic_importer --task part_annotation --check-images
+    
+    # 大文件使用 8 个进程解码
+    python -m importers.generic_importer --task annotation --workers 8
+    
+    # 导入中断后，从上次提交的位置继续
+    python -m importers.generic_importer --task annotation --resume
+    
+    # 直接导入压缩或列式数据（.jsonl.gz / .jsonl.zst / .parquet / .arrow）
+    python -m importers.generic_importer --source data.jsonl.zst --db databases/custom.db
 """
 
 import json
 import os
 import sys
 import argparse
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+from sqlalchemy import func, literal_column, or_, select, true, update
+from sqlalchemy.dialects.sqlite import dialect as sqlite_dialect, insert as sqlite_insert
+
 # 添加项目路径
 # generic_importer.py -> importers/ -> src/ -> modular_version/
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.db_models import Annotation, get_session, get_engine, Base
+from src.db_models import Annotation, ImportCheckpoint, get_session, get_engine, init_database, Base
+from src.path_cache import PathStatusCache, print_missing_report
+from src.importers.readers import LineReader, get_reader
+
+
+# 导入时写入的列（claimed_at / lease_expiry 由标注端维护，导入不写入）
+IMPORT_COLUMNS = ['model_id', 'annotated', 'uid', 'score', 'modified', 'data', 'content_hash',
+                  'created_at', 'updated_at']
+
+
+def _build_upsert():
+    """
+    编译 INSERT ... ON CONFLICT(model_id) DO UPDATE 语句（更新时保留 created_at 和占有/租约信息）
+    
+    Returns:
+        (SQL 字符串, 各列的参数处理函数)：按 IMPORT_COLUMNS 顺序传入元组，
+        直接交给驱动 executemany，省去逐行构造 ORM 对象和参数字典的开销
+    """
+    dialect = sqlite_dialect()
+    stmt = sqlite_insert(Annotation.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['model_id'],
+        set_={name: stmt.excluded[name] for name in IMPORT_COLUMNS if name not in ('model_id', 'created_at')},
+    )
+    compiled = stmt.compile(dialect=dialect, column_keys=IMPORT_COLUMNS)
+    assert compiled.positiontup == IMPORT_COLUMNS
+    columns = Annotation.__table__.c
+    processors = [columns[name].type.bind_processor(dialect) for name in IMPORT_COLUMNS]
+    return str(compiled), processors
+
+
+UPSERT_SQL, UPSERT_PROCESSORS = _build_upsert()
+
+# 图片路径拼接日志最多打印的条数（逐条打印会拖慢大文件导入）
+PATH_LOG_LIMIT = 10
+
+# 多进程解码时每个字节区间的大小
+DECODE_CHUNK_BYTES = 4 * 1024 * 1024
 
 
 # 任务配置映射（默认路径）
@@ -75,25 +134,283 @@ class GenericImporter:
     """通用数据导入器"""
     
     def __init__(self):
-        self.stats = {'imported': 0, 'updated': 0, 'errors': 0}
+        self.stats = self.empty_stats()
+        self.path_logs = 0  # 已打印的图片路径处理日志条数
+        self.lines_read = 0  # iter_jsonl 已读取的行数
     
-    def parse_jsonl(self, filepath: str):
-        """解析JSONL文件"""
+    @staticmethod
+    def empty_stats() -> dict:
+        """导入统计：新增、更新（内容变化）、未变化（跳过）、源中已删除、错误"""
+        return {'imported': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'errors': 0}
+    
+    def iter_records(self, filepath: str, start_offset: int = 0, start_line: int = 0):
+        """
+        按数据源格式（见 readers.py）流式读取记录
+        
+        Yields:
+            (行号, 位置, 记录)，位置可用于断点续传
+        """
+        reader = get_reader(filepath)
+        if isinstance(reader, LineReader):
+            return self.iter_jsonl(filepath, start_offset, start_line, reader=reader)
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"文件不存在: {filepath}")
+        return reader.iter_records(filepath, start_offset, start_line)
+    
+    def iter_jsonl(self, filepath: str, start_offset: int = 0, start_line: int = 0, end_offset: int = None,
+                   reader: LineReader = None):
+        """
+        流式解析JSONL文件（按字节读取，内存占用与文件大小无关）
         
-        records = []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
-                if line:
-                    try:
-                        data = json.loads(line)
-                        records.append(data)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️  第 {line_num} 行 JSON 解析错误: {e}")
-                        continue
-        return records
+        无法解析的行（JSON 错误、非 UTF-8 编码）打印警告后跳过，不影响其它行
+        
+        Args:
+            filepath: 文件路径
+            start_offset: 起始字节偏移（必须位于行首）
+            start_line: 起始偏移之前的行数
+            end_offset: 结束字节偏移（必须位于行首），为空时读到文件末尾
+            reader: 行读取器（压缩格式时偏移为解压后的偏移），默认按文件后缀选择
+        
+        Yields:
+            (行号, 该行结束处的字节偏移, 记录)
+        """
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"文件不存在: {filepath}")
+        
+        offset = start_offset
+        self.lines_read = start_line
+        with (reader or get_reader(filepath)).open(filepath, start_offset) as f:
+            for raw in f:
+                if end_offset is not None and offset >= end_offset:
+                    break
+                self.lines_read += 1
+                offset += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:  # JSONDecodeError / UnicodeDecodeError
+                    self._line_error(self.lines_read, f"JSON 解析错误: {e}", counted=False)
+                    continue
+                yield self.lines_read, offset, data
+    
+    def parse_jsonl(self, filepath: str):
+        """解析JSONL文件（一次性返回全部记录，大文件请使用 iter_records）"""
+        return [record for _, _, record in self.iter_records(filepath)]
+    
+    def iter_rows(self, records, base_path: str = None):
+        """
+        转换阶段：把 iter_jsonl 产出的记录转换为待写入的行
+        
+        转换失败的记录计入错误数后跳过
+        
+        Yields:
+            (行号, 字节偏移, 行字典)
+        """
+        for line_num, offset, record in records:
+            if not record:
+                continue
+            try:
+                model_id, attrs = self.split_record(record)
+                metadata, business_data = self.transform_record(model_id, attrs, base_path)
+            except Exception as e:
+                self._line_error(line_num, f"错误: {e}")
+                continue
+            content_hash = self.content_hash(metadata, business_data)
+            yield line_num, offset, {'model_id': model_id, **metadata, 'data': business_data,
+                                     'content_hash': content_hash}
+    
+    def iter_rows_parallel(self, source: str, base_path: str = None, workers: int = 4,
+                           chunk_bytes: int = DECODE_CHUNK_BYTES, start_offset: int = 0, start_line: int = 0):
+        """
+        多进程版本的 iter_jsonl + iter_rows：按行边界把文件切成字节区间，在进程池中解码和转换
+        
+        结果按区间顺序取回，产出顺序、行号和错误报告与单进程完全一致；
+        最多同时保留 workers * 2 个区间的结果，内存占用有上限
+        
+        Args:
+            start_offset / start_line: 与 iter_jsonl 相同，从指定位置开始读取
+        
+        Yields:
+            (行号, 字节偏移, 行字典)
+        """
+        line_base = start_line
+        pending = deque()
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            for start, end in split_ranges(source, chunk_bytes, start_offset):
+                pending.append(executor.submit(_decode_range, source, start, end, base_path))
+                if len(pending) < workers * 2:
+                    continue
+                rows, events, lines = pending.popleft().result()
+                yield from self._replay_range(line_base, rows, events)
+                line_base += lines
+            while pending:
+                rows, events, lines = pending.popleft().result()
+                yield from self._replay_range(line_base, rows, events)
+                line_base += lines
+        finally:
+            executor.shutdown(cancel_futures=True)
+    
+    def _replay_range(self, line_base: int, rows: list, events: list):
+        """在写入进程中按顺序重放子进程收集的日志和行错误，并产出换算为全局行号的结果"""
+        for event in events:
+            if event[0] == 'path':
+                self._path_log(event[1])
+            else:
+                _, line_num, message, counted = event
+                self._line_error(line_base + line_num, message, counted)
+        for line_num, offset, row in rows:
+            yield line_base + line_num, offset, row
+    
+    @staticmethod
+    def split_record(record: dict) -> tuple:
+        """
+        从一行 JSONL 中取出 model_id 和属性字典
+        
+        支持两种结构：
+        - 嵌套：{"<model_id>": {属性...}}
+        - 扁平：{"id"/"model_id": "<model_id>", 属性...}
+        """
+        # 检查 'id' 或 'model_id' 是否存在，并用它作为 model_id
+        if 'id' in record:
+            model_id = record.pop('id')
+        elif 'model_id' in record:
+            model_id = record.pop('model_id')
+        else:
+            # 如果都没有，使用旧的逻辑，但这可能会对扁平结构失败
+            model_id = list(record.keys())[0]
+        
+        attrs = record.get(model_id)
+        # 如果 attrs 不是字典（发生在扁平结构下），将整个 record 作为 attrs
+        if not isinstance(attrs, dict):
+            attrs = record
+        return model_id, attrs
+    
+    @staticmethod
+    def content_hash(metadata: dict, business_data: dict) -> str:
+        """源数据内容哈希（键排序后的 JSON 的 SHA-1），与字段顺序无关"""
+        content = json.dumps({**metadata, 'data': business_data}, sort_keys=True, ensure_ascii=False,
+                             separators=(',', ':'), default=str)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+    
+    def write_batch(self, conn, rows: list, checkpoint: dict = None):
+        """
+        批量写入一批记录：INSERT ... ON CONFLICT(model_id) DO UPDATE（executemany）
+        
+        写入前用一次主键查询取出已有记录的内容哈希：哈希相同的记录完全不写入（不改动
+        updated_at），其余区分新增和更新（同一批中重复出现的 model_id，后出现的计为更新并覆盖前者）
+        
+        Args:
+            checkpoint: 导入断点（import_checkpoints 的列值），与本批数据在同一事务中提交
+        """
+        existing = dict(conn.execute(
+            select(Annotation.model_id, Annotation.content_hash)
+            .where(Annotation.model_id.in_({row['model_id'] for row in rows}))
+        ).all())
+        
+        now = datetime.now()
+        staged = []  # [(model_id, 统计类型, 参数元组)]
+        for row in rows:
+            if row['model_id'] in existing and existing[row['model_id']] == row['content_hash']:
+                self.stats['unchanged'] += 1
+                continue
+            row['created_at'] = now
+            row['updated_at'] = now
+            try:
+                # 按列类型转换参数（布尔、JSON、日期时间），与 ORM 写入的存储格式一致
+                param = tuple(
+                    process(row[name]) if process else row[name]
+                    for name, process in zip(IMPORT_COLUMNS, UPSERT_PROCESSORS)
+                )
+            except Exception as e:
+                self._record_error(f"{row['model_id']} 数据错误: {e}")
+                continue
+            kind = 'updated' if row['model_id'] in existing else 'imported'
+            existing[row['model_id']] = row['content_hash']
+            staged.append((row['model_id'], kind, param))
+        
+        try:
+            if staged:
+                conn.exec_driver_sql(UPSERT_SQL, [param for _, _, param in staged])
+            if checkpoint:
+                self.save_checkpoint(conn, checkpoint)
+            conn.commit()
+            for _, kind, _ in staged:
+                self.stats[kind] += 1
+        except Exception as e:
+            # 整批失败时逐条重试，只跳过出错的记录
+            conn.rollback()
+            print(f"⚠️  批量写入失败，逐条重试: {e}")
+            for model_id, kind, param in staged:
+                try:
+                    conn.exec_driver_sql(UPSERT_SQL, param)
+                    conn.commit()
+                    self.stats[kind] += 1
+                except Exception as row_error:
+                    conn.rollback()
+                    self._record_error(f"{model_id} 写入错误: {row_error}")
+            if checkpoint:
+                self.save_checkpoint(conn, checkpoint)
+                conn.commit()
+    
+    @staticmethod
+    def save_checkpoint(conn, checkpoint: dict):
+        """写入（覆盖）数据源的导入断点，不提交"""
+        values = {**checkpoint, 'updated_at': datetime.now()}
+        stmt = sqlite_insert(ImportCheckpoint).values(**values)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['source'],
+            set_={key: stmt.excluded[key] for key in values if key != 'source'},
+        ))
+    
+    @staticmethod
+    def load_checkpoint(engine, source: str) -> tuple:
+        """
+        读取数据源的导入断点，用于续传
+        
+        数据源的大小或修改时间与断点记录不一致时，断点作废，从头导入
+        
+        Returns:
+            (起始位置, 起始行号)；上次导入已完成时返回 None
+        """
+        st = os.stat(source)
+        with engine.connect() as conn:
+            checkpoint = conn.execute(
+                select(ImportCheckpoint).where(ImportCheckpoint.source == os.path.abspath(source))
+            ).first()
+        
+        if checkpoint is None:
+            print("ℹ️  没有找到导入断点，从头导入")
+            return 0, 0
+        if checkpoint.size != st.st_size or checkpoint.mtime != st.st_mtime:
+            print("⚠️  数据源在上次导入后已变化，断点作废，从头导入")
+            return 0, 0
+        if checkpoint.completed:
+            print("✓ 上次导入已完成，没有需要续传的数据")
+            return None
+        print(f"⏩ 从断点续传: 第 {checkpoint.line} 行之后（位置 {checkpoint.offset}）")
+        return checkpoint.offset, checkpoint.line
+    
+    def _path_log(self, message: str):
+        """打印图片路径处理日志（最多 PATH_LOG_LIMIT 条）"""
+        if self.path_logs < PATH_LOG_LIMIT:
+            self.path_logs += 1
+            print(message)
+    
+    def _line_error(self, line_num: int, message: str, counted: bool = True):
+        """报告某一行的问题：counted 为真时计入错误数，否则只打印警告"""
+        if counted:
+            self._record_error(f"第 {line_num} 行{message}")
+        else:
+            print(f"⚠️  第 {line_num} 行 {message}")
+    
+    def _record_error(self, message: str):
+        """记录一条错误（只打印前 5 条）"""
+        self.stats['errors'] += 1
+        if self.stats['errors'] <= 5:
+            print(f"⚠️  {message}")
     
     def transform_record(self, model_id: str, attrs: dict, base_path: str = None) -> tuple:
         """
@@ -112,11 +429,16 @@ class GenericImporter:
         """
         # 元数据（从attrs中提取，如果不存在则用默认值）
         metadata = {
-            'annotated': attrs.get('annotated', False),
-            'uid': attrs.get('uid', ''),
-            'score': attrs.get('score', 1),
-            'modified': attrs.get('modified', False),  # 导入时默认为未修改
+            'annotated': False,
+            'uid': '',
+            'score': 1,
+            'modified': False,  # 导入时默认为未修改
         }
+        # 值为 None 时也用默认值：列式格式（Parquet/Arrow）中缺失的列值读出为 None，
+        # 而这些列在数据库中不允许为空
+        for key in metadata:
+            if attrs.get(key) is not None:
+                metadata[key] = attrs[key]
         
         # 业务数据 - 通用处理
         # 业务数据 - 将除了元数据之外的所有字段都放入 business_data
@@ -127,78 +449,129 @@ class GenericImporter:
             for key, value in business_data.items():
                 if key.startswith('image_url') and isinstance(value, str) and not value.startswith('/'):
                     business_data[key] = os.path.join(base_path, value)
-                    print(f"  处理图片路径: {key} = {business_data[key]}")
+                    if self.path_logs < PATH_LOG_LIMIT:
+                        self._path_log(f"  处理图片路径: {key} = {business_data[key]}")
         
         return metadata, business_data
     
-    def assign_tasks(self, db_path: str, annotators: list, only_unassigned: bool = True):
+    @staticmethod
+    def parse_annotators(annotators: list) -> list:
+        """
+        解析分配员参数，支持 "名称:权重" 格式（权重默认为 1）
+        
+        Returns:
+            [(分配员, 权重)]
+        """
+        parsed = []
+        for item in annotators:
+            name, _, weight = item.partition(':')
+            try:
+                weight = float(weight) if weight else 1.0
+            except ValueError:
+                raise ValueError(f"分配员权重无效: {item}")
+            if weight <= 0:
+                raise ValueError(f"分配员权重必须大于 0: {item}")
+            parsed.append((name, weight))
+        return parsed
+    
+    @staticmethod
+    def split_counts(total: int, weights: list) -> list:
+        """
+        按权重拆分任务数（最大余数法，余数相同时靠前的分配员优先）
+        
+        权重相同时与平均分配一致：前 total % n 个分配员多分一个
+        """
+        weight_sum = sum(weights)
+        exact = [total * w / weight_sum for w in weights]
+        counts = [int(x) for x in exact]
+        order = sorted(range(len(weights)), key=lambda i: (-(exact[i] - counts[i]), i))
+        for i in order[:total - sum(counts)]:
+            counts[i] += 1
+        return counts
+    
+    def assign_tasks(self, db_path: str, annotators: list, only_unassigned: bool = True, dry_run: bool = False):
         """
-        将任务平均分配给多个分配员
+        将任务按权重分配给多个分配员
+        
+        按 rowid 顺序把待分配任务切成连续的区间，每个分配员一条 UPDATE，
+        不把记录加载到内存
         
         Args:
             db_path: 数据库文件路径
-            annotators: 分配员列表，如 ['an1', 'an2', 'an3']
+            annotators: 分配员列表，如 ['an1', 'an2', 'an3'] 或 ['an1:2', 'an2:1']（带权重）
             only_unassigned: 是否只分配未分配的任务（uid为空），默认为True
+            dry_run: 只打印分配方案，不修改数据库
         """
         if not annotators:
             print("⚠️  未指定分配员，跳过分配")
             return
         
+        weighted = self.parse_annotators(annotators)
+        
         print(f"\n{'='*60}")
-        print(f"开始分配任务")
+        print(f"开始分配任务{'（试运行）' if dry_run else ''}")
         print(f"{'='*60}")
         print(f"🗄️  数据库: {db_path}")
         print(f"👥 分配员: {', '.join(annotators)}")
         print(f"📋 分配模式: {'仅未分配任务' if only_unassigned else '所有任务'}")
         
-        session = get_session(db_path)
+        engine = get_engine(db_path)
+        rowid = literal_column('rowid')
+        # 需要分配的任务（uid为空或空字符串）
+        condition = or_(Annotation.uid == '', Annotation.uid.is_(None)) if only_unassigned else true()
         
         try:
-            # 查询需要分配的任务
-            if only_unassigned:
-                # 只查询未分配的任务（uid为空或空字符串）
-                tasks = session.query(Annotation).filter(
-                    (Annotation.uid == '') | (Annotation.uid.is_(None))
-                ).all()
-            else:
-                # 查询所有任务
-                tasks = session.query(Annotation).all()
-            
-            total_tasks = len(tasks)
-            num_annotators = len(annotators)
-            
-            if total_tasks == 0:
-                print(f"⚠️  没有需要分配的任务")
-                return
-            
-            print(f"📊 找到 {total_tasks} 个任务，需要分配给 {num_annotators} 个分配员")
-            
-            # 计算每个分配员应该分配的任务数
-            base_count = total_tasks // num_annotators
-            remainder = total_tasks % num_annotators
-            
-            # 分配任务
-            assignment_stats = {}
-            task_idx = 0
-            
-            for i, annotator in enumerate(annotators):
-                # 前 remainder 个分配员多分配一个任务
-                count = base_count + (1 if i < remainder else 0)
-                assignment_stats[annotator] = count
+            with engine.begin() as conn:
+                total_tasks = conn.execute(
+                    select(func.count()).select_from(Annotation).where(condition)
+                ).scalar_one()
+                num_annotators = len(weighted)
                 
-                # 分配任务
-                for _ in range(count):
-                    if task_idx < total_tasks:
-                        task = tasks[task_idx]
-                        task.uid = annotator
-                        task_idx += 1
-            
-            # 提交所有更改
-            session.commit()
+                if total_tasks == 0:
+                    print(f"⚠️  没有需要分配的任务")
+                    return
+                
+                print(f"📊 找到 {total_tasks} 个任务，需要分配给 {num_annotators} 个分配员")
+                
+                counts = self.split_counts(total_tasks, [w for _, w in weighted])
+                
+                # 扫描一遍 rowid（只读整数），记录每个分配员区间的起止 rowid
+                ranges = []
+                bounds = iter(counts)
+                remaining = next(bounds)
+                first = last = None
+                rowids = conn.execution_options(yield_per=10000).execute(
+                    select(rowid).select_from(Annotation).where(condition).order_by(rowid)
+                ).scalars()
+                for rid in rowids:
+                    while remaining == 0:
+                        ranges.append((first, last))
+                        first = None
+                        remaining = next(bounds)
+                    if first is None:
+                        first = rid
+                    last = rid
+                    remaining -= 1
+                ranges.append((first, last))
+                ranges += [(None, None)] * (num_annotators - len(ranges))
+                
+                # 分配任务：每个分配员一条 UPDATE
+                assignment_stats = {}
+                now = datetime.now()
+                for (annotator, _), count, (lo, hi) in zip(weighted, counts, ranges):
+                    assignment_stats[annotator] = count
+                    if dry_run or not count:
+                        continue
+                    conn.execute(
+                        update(Annotation)
+                        .where(condition)
+                        .where(rowid.between(lo, hi))
+                        .values(uid=annotator, claimed_at=now, lease_expiry=None)
+                    )
             
             # 打印分配统计
             print(f"\n{'='*60}")
-            print(f"✅ 分配完成！")
+            print(f"{'📝 分配方案（未修改数据库）' if dry_run else '✅ 分配完成！'}")
             print(f"{'='*60}")
             print(f"📊 分配统计:")
             for annotator, count in assignment_stats.items():
@@ -207,22 +580,48 @@ class GenericImporter:
             print(f"{'='*60}\n")
             
         except Exception as e:
-            session.rollback()
             print(f"❌ 分配失败: {e}")
             raise
+        finally:
+            engine.dispose()
+    
+    def check_images(self, db_path: str, workers: int = 16) -> dict:
+        """
+        并行检查数据库中所有图片路径是否存在，打印缺失报告
+        
+        Args:
+            db_path: 数据库文件路径
+            workers: 并行线程数
+            
+        Returns:
+            缺失报告（见 PathStatusCache.missing_report）
+        """
+        print(f"\n🔍 检查图片路径: {db_path}")
+        session = get_session(db_path)
+        try:
+            records = session.query(Annotation.model_id, Annotation.data).yield_per(1000)
+            report = PathStatusCache().missing_report(records, workers=workers)
         finally:
             session.close()
+        print_missing_report(report)
+        return report
     
-    def import_to_db(self, source: str, db_path: str, clean: bool = False, batch_size: int = 1000, base_path: str = None):
+    def import_to_db(self, source: str, db_path: str, clean: bool = False, batch_size: int = 1000, base_path: str = None,
+                     workers: int = 1, resume: bool = False):
         """
         导入数据到数据库
         
+        增量导入时，内容哈希未变化的记录直接跳过；完整读取数据源后还会统计数据库中
+        有、但数据源中已不存在的记录（只统计，不删除）
+        
         Args:
             source: 源数据文件路径
             db_path: 数据库文件路径
             clean: 是否清空数据库
-            batch_size: 批处理大小
+            batch_size: 每次批量写入（一次 executemany + 一次提交）的记录数
             base_path: 图片路径的基础路径，如果提供则会拼接到相对路径前
+            workers: 解码和转换使用的进程数，大于 1 时启用多进程解码（写入始终在当前进程）
+            resume: 从上次提交的断点继续导入（不清空数据库，忽略 clean）
         """
         print(f"\n{'='*60}")
         print(f"开始导入数据")
@@ -234,79 +633,79 @@ class GenericImporter:
         
         # 初始化数据库
         engine = get_engine(db_path)
-        if clean:
+        if clean and not resume:
             print("🗑️  清空数据库...")
             Base.metadata.drop_all(engine)
-        Base.metadata.create_all(engine)
+        init_database(db_path)
+        # 只有从头读取整个数据源的增量导入才统计源中已删除的记录
+        track_removed = not clean and not resume
         
         session = get_session(db_path)
         
         try:
-            print(f"📖 解析数据...")
-            records = self.parse_jsonl(source)
-            print(f"✓ 找到 {len(records)} 条记录")
+            st = os.stat(source)
+            total_bytes = st.st_size
+            position = self.load_checkpoint(engine, source) if resume else (0, 0)
+            if position is None:
+                return
+            start_offset, start_line = position
+            reader = get_reader(source)
+            print(f"📖 流式解析并导入数据 ({reader.name}, {total_bytes / 1024 ** 2:.1f} MB)...")
+            
+            # 断点与每批数据一起提交：记录最后一条已写入记录所在行的结束位置
+            def checkpoint(line_num, offset, completed=False):
+                return {'source': os.path.abspath(source), 'size': total_bytes, 'mtime': st.st_mtime,
+                        'offset': offset, 'line': line_num, 'completed': completed}
             
-            for idx, record in enumerate(records, 1):
+            # 读取 -> 转换 -> 分批写入，全程只保留一个批次在内存中；
+            # 每批单独提交，中途出错时之前的批次已经落库
+            if workers > 1 and not reader.raw_offsets:
+                print(f"⚠️  {reader.name} 格式不支持多进程解码，使用单进程")
+                workers = 1
+            if workers > 1:
+                print(f"⚙️  使用 {workers} 个进程解码")
+                rows = self.iter_rows_parallel(source, base_path, workers,
+                                               start_offset=start_offset, start_line=start_line)
+            else:
+                rows = self.iter_rows(self.iter_records(source, start_offset, start_line), base_path)
+            with engine.connect() as conn:
+                if track_removed:
+                    # 本次导入出现过的 model_id（连接级临时表）
+                    conn.exec_driver_sql("CREATE TEMP TABLE IF NOT EXISTS import_seen (model_id TEXT PRIMARY KEY)")
+                
+                def flush(batch, line_num, offset):
+                    self.write_batch(conn, batch, checkpoint(line_num, offset))
+                    if track_removed:
+                        conn.exec_driver_sql("INSERT OR IGNORE INTO import_seen VALUES (?)",
+                                             [(row['model_id'],) for row in batch])
+                        conn.commit()
+                
+                batch = []
+                line_num, offset = start_line, start_offset
                 try:
-                    # 获取 model_id 和属性
-                    if not record:
-                        continue
-                    
-                    # 检查 'id' 或 'model_id' 是否存在，并用它作为 model_id
-                    if 'id' in record:
-                        model_id = record.pop('id')
-                    elif 'model_id' in record:
-                        model_id = record.pop('model_id')
-                    else:
-                        # 如果都没有，使用旧的逻辑，但这可能会对扁平结构失败
-                        model_id = list(record.keys())[0]
-                        attrs = record[model_id]
-                        # 为扁平结构设置 attrs
-                        if not isinstance(attrs, dict):
-                            attrs = record
-                    
-                    # 如果 attrs 不是字典（发生在扁平结构下），将整个 record 作为 attrs
-                    if not isinstance(record.get(model_id), dict):
-                        attrs = record
-                    
-                    # 转换数据
-                    metadata, business_data = self.transform_record(model_id, attrs, base_path)
-                    
-                    # 检查是否存在
-                    existing = session.query(Annotation).filter_by(model_id=model_id).first()
-                    
-                    if existing:
-                        # 更新
-                        existing.annotated = metadata['annotated']
-                        existing.uid = metadata['uid']
-                        existing.score = metadata['score']
-                        existing.modified = metadata['modified']
-                        existing.data = business_data
-                        self.stats['updated'] += 1
-                    else:
-                        # 新增
-                        annotation = Annotation(
-                            model_id=model_id,
-                            annotated=metadata['annotated'],
-                            uid=metadata['uid'],
-                            score=metadata['score'],
-                            modified=metadata['modified'],
-                            data=business_data
-                        )
-                        session.add(annotation)
-                        self.stats['imported'] += 1
-                    
-                    # 批量提交
-                    if idx % batch_size == 0:
-                        session.commit()
-                        print(f"  已处理 {idx} 条...")
+                    for line_num, offset, row in rows:
+                        batch.append(row)
+                        if len(batch) >= batch_size:
+                            # 先取出批次再写入：写入失败时 finally 不会重复写入同一批
+                            pending, batch = batch, []
+                            flush(pending, line_num, offset)
+                            if reader.raw_offsets:
+                                print(f"  已处理 {line_num} 行 ({offset * 100 / max(total_bytes, 1):.1f}%)...")
+                            else:
+                                print(f"  已处理 {line_num} 行...")
+                finally:
+                    # 中断时也写入已转换完成的记录
+                    if batch:
+                        flush(batch, line_num, offset)
                 
-                except Exception as e:
-                    self.stats['errors'] += 1
-                    if self.stats['errors'] <= 5:
-                        print(f"⚠️  第 {idx} 条错误: {e}")
-            
-            session.commit()
+                self.save_checkpoint(conn, checkpoint(line_num, offset, completed=True))
+                conn.commit()
+                
+                if track_removed:
+                    self.stats['removed'] = conn.exec_driver_sql(
+                        "SELECT COUNT(*) FROM annotations WHERE model_id NOT IN (SELECT model_id FROM import_seen)"
+                    ).scalar()
+                    conn.exec_driver_sql("DROP TABLE import_seen")
             
             # 打印统计
             print(f"\n{'='*60}")
@@ -315,6 +714,9 @@ class GenericImporter:
             print(f"📊 统计:")
             print(f"  - 新增: {self.stats['imported']} 条")
             print(f"  - 更新: {self.stats['updated']} 条")
+            print(f"  - 未变化: {self.stats['unchanged']} 条（跳过）")
+            if track_removed:
+                print(f"  - 源中已删除: {self.stats['removed']} 条（数据库中保留）")
             print(f"  - 错误: {self.stats['errors']} 条")
             
             # 查询并打印第一条记录，用于验证
@@ -358,6 +760,47 @@ class GenericImporter:
             session.close()
 
 
+def split_ranges(filepath: str, chunk_bytes: int = DECODE_CHUNK_BYTES, start: int = 0) -> list:
+    """从 start（行首）开始，按行边界把文件切分为约 chunk_bytes 大小的字节区间 [(起始偏移, 结束偏移)]"""
+    size = os.path.getsize(filepath)
+    ranges = []
+    with open(filepath, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # 移动到下一行行首
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+class _RangeDecoder(GenericImporter):
+    """子进程中的解码器：不直接打印，按发生顺序收集日志和行错误，交给写入进程重放"""
+    
+    def __init__(self):
+        super().__init__()
+        self.events = []  # [('path', 信息)] / [('line', 区间内行号, 信息, 是否计入错误数)]
+    
+    def _path_log(self, message: str):
+        self.path_logs += 1
+        self.events.append(('path', message))
+    
+    def _line_error(self, line_num: int, message: str, counted: bool = True):
+        self.events.append(('line', line_num, message, counted))
+
+
+def _decode_range(source: str, start: int, end: int, base_path: str = None) -> tuple:
+    """
+    进程池任务：解码并转换一个字节区间
+    
+    Returns:
+        (行结果列表, 日志和行错误列表, 区间行数)，行号从区间起点开始计数
+    """
+    decoder = _RangeDecoder()
+    rows = list(decoder.iter_rows(decoder.iter_jsonl(source, start, end_offset=end), base_path))
+    return rows, decoder.events, decoder.lines_read
+
+
 def main():
     """命令行入口"""
     parser = argparse.ArgumentParser(
@@ -386,6 +829,21 @@ def main():
   # 分配所有任务（包括已分配的）
   python -m importers.generic_importer --task annotation --assign an1 an2 an3 --assign-all
 
+  # 按权重分配（an1 分到的任务是 an2 的两倍），只打印分配方案
+  python -m importers.generic_importer --task annotation --assign an1:2 an2 --dry-run
+
+  # 导入后检查图片路径
+  python -m importers.generic_importer --task part_annotation --check-images
+
+  # 大文件使用 8 个进程解码
+  python -m importers.generic_importer --task annotation --workers 8
+
+  # 导入中断后，从上次提交的位置继续
+  python -m importers.generic_importer --task annotation --resume
+
+  # 直接导入压缩或列式数据（.jsonl.gz / .jsonl.zst / .parquet / .arrow）
+  python -m importers.generic_importer --source data.jsonl.zst --db databases/custom.db
+
 支持的任务:
 """
     )
@@ -397,19 +855,29 @@ def main():
     parser.add_argument('--task', '-t', type=str, choices=list(TASK_CONFIGS.keys()),
                        help='任务名称（自动使用默认路径）')
     parser.add_argument('--source', '-s', type=str,
-                       help='数据源文件（JSONL格式）')
+                       help='数据源文件（JSONL，或 .jsonl.gz / .jsonl.zst / .parquet / .arrow）')
     parser.add_argument('--db', '-d', type=str,
                        help='数据库路径')
     parser.add_argument('--incremental', '-i', action='store_true',
                        help='增量导入（不清除旧数据），默认为清空导入')
+    parser.add_argument('--resume', '-r', action='store_true',
+                       help='从上次中断的位置继续导入（不清空数据库）')
     parser.add_argument('--list', '-l', action='store_true',
                        help='列出所有支持的任务')
     parser.add_argument('--base-path', '-b', type=str,
                        help='图片路径的基础路径，用于拼接相对路径')
     parser.add_argument('--assign', '-a', type=str, nargs='+',
-                       help='分配员列表，用于平均分配任务（如: --assign an1 an2 an3）')
+                       help='分配员列表，用于平均分配任务（如: --assign an1 an2 an3），可用 名称:权重 按权重分配')
     parser.add_argument('--assign-all', action='store_true',
                        help='分配所有任务（包括已分配的），默认只分配未分配的任务')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                       help='每次批量写入的记录数（默认 1000）')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                       help='解码和转换数据的进程数（默认 1，大文件可设为 CPU 核数）')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='只打印任务分配方案，不修改数据库（配合 --assign 使用）')
+    parser.add_argument('--check-images', action='store_true',
+                       help='导入后并行检查所有图片路径，报告缺失的图片')
     
     args = parser.parse_args()
     
@@ -426,15 +894,15 @@ def main():
         print("\n使用方式: python -m importers.generic_importer --task <任务名>\n")
         return
     
-    # 确定导入模式
-    clean_mode = not args.incremental
+    # 确定导入模式（续传时不清空）
+    clean_mode = not (args.incremental or args.resume)
     
     # 如果没有指定任何参数，则导入所有任务
     if not args.task and not args.source and not args.db:
         print(f"\n🚀 默认执行：导入所有任务 ({'清空模式' if clean_mode else '增量模式'})")
         importer = GenericImporter()
         for task_name, config in TASK_CONFIGS.items():
-            importer.stats = {'imported': 0, 'updated': 0, 'errors': 0} # 重置统计
+            importer.stats = importer.empty_stats() # 重置统计
             print(f"\n---\n🔄 正在处理任务: {task_name}...")
             source = os.path.join(project_root, config['source'])
             db_path = os.path.join(project_root, config['db'])
@@ -446,11 +914,16 @@ def main():
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
             # 使用任务配置中的基础路径，如果命令行参数有指定则优先使用命令行参数
             base_path = args.base_path or config.get('base_path')
-            importer.import_to_db(source=source, db_path=db_path, clean=clean_mode, base_path=base_path)
+            importer.import_to_db(source=source, db_path=db_path, clean=clean_mode, base_path=base_path,
+                                  batch_size=args.batch_size, workers=args.workers, resume=args.resume)
             
             # 如果指定了分配员，执行分配
             if args.assign:
-                importer.assign_tasks(db_path=db_path, annotators=args.assign, only_unassigned=not args.assign_all)
+                importer.assign_tasks(db_path=db_path, annotators=args.assign, only_unassigned=not args.assign_all,
+                                      dry_run=args.dry_run)
+            
+            if args.check_images:
+                importer.check_images(db_path)
         
         print("\n🎉 所有任务导入完成！\n")
         return
@@ -486,11 +959,16 @@ def main():
     if not base_path and args.task:
         base_path = TASK_CONFIGS[args.task].get('base_path')
     
-    importer.import_to_db(source=source, db_path=db_path, clean=clean_mode, base_path=base_path)
+    importer.import_to_db(source=source, db_path=db_path, clean=clean_mode, base_path=base_path,
+                          batch_size=args.batch_size, workers=args.workers, resume=args.resume)
     
     # 如果指定了分配员，执行分配
     if args.assign:
-        importer.assign_tasks(db_path=db_path, annotators=args.assign, only_unassigned=not args.assign_all)
+        importer.assign_tasks(db_path=db_path, annotators=args.assign, only_unassigned=not args.assign_all,
+                              dry_run=args.dry_run)
+    
+    if args.check_images:
+        importer.check_images(db_path)
     
     if args.task:
         print(f"✅ 可以运行: python src/main_multi.py --task {args.task} --dev --uid user1\n")
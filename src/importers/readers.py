@@ -0,0 +1,160 @@
+"""
+数据源读取器：按文件后缀选择读取方式，流式读取，不需要先解压到磁盘
+
+- .jsonl（及其它未识别的后缀）：按行读取，位置为文件字节偏移，支持多进程按区间解码
+- .jsonl.gz：gzip 流式解压后按行读取
+- .jsonl.zst：zstandard 流式解压后按行读取（可选依赖 zstandard）
+- .parquet / .arrow / .feather：按记录批次读取，每行一条扁平记录（可选依赖 pyarrow）
+
+压缩格式的位置是解压后数据流中的偏移，列式格式的位置是已读取的行数；
+两者都可用于断点续传（续传时从头解压/读取并跳过已导入的部分）
+
+添加新格式：继承 LineReader（实现 _open）或 RecordReader（实现 iter_records），
+并用 @register_reader 注册
+"""
+
+import gzip
+import io
+from typing import Iterator, List, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow 为可选依赖
+    pyarrow = None
+
+
+class SourceReader:
+    """数据源读取器基类"""
+
+    name = ''
+    suffixes: Tuple[str, ...] = ()
+    # 位置是否为源文件的字节偏移（可计算进度百分比、按字节区间多进程解码）
+    raw_offsets = False
+
+    def matches(self, filepath: str) -> bool:
+        return filepath.lower().endswith(self.suffixes)
+
+
+class LineReader(SourceReader):
+    """按行读取 JSON 的格式：提供解压后的二进制数据流，由导入器逐行解析"""
+
+    def open(self, filepath: str, start_offset: int = 0):
+        """打开数据流，并移动到 start_offset（必须位于行首）"""
+        stream = self._open(filepath)
+        if start_offset:
+            self._skip(stream, start_offset)
+        return stream
+
+    def _open(self, filepath: str):
+        raise NotImplementedError
+
+    def _skip(self, stream, offset: int):
+        stream.seek(offset)
+
+
+class RecordReader(SourceReader):
+    """直接产出记录字典的格式（如列式存储）"""
+
+    def iter_records(self, filepath: str, start_offset: int = 0, start_line: int = 0) -> Iterator[tuple]:
+        """
+        Yields:
+            (行号, 位置, 记录)，位置为已读取的行数
+        """
+        raise NotImplementedError
+
+
+_READERS: List[SourceReader] = []
+
+
+def register_reader(reader_cls):
+    """注册读取器（类装饰器），后注册的优先匹配"""
+    _READERS.insert(0, reader_cls())
+    return reader_cls
+
+
+@register_reader
+class JsonlReader(LineReader):
+    name = 'JSONL'
+    suffixes = ('.jsonl', '.json')
+    raw_offsets = True
+
+    def _open(self, filepath: str):
+        return open(filepath, 'rb')
+
+
+def get_reader(filepath: str) -> SourceReader:
+    """按文件后缀选择读取器，未识别的后缀按普通 JSONL 读取"""
+    for reader in _READERS:
+        if reader.matches(filepath):
+            return reader
+    return _READERS[-1]  # 最先注册的 JsonlReader
+
+
+@register_reader
+class GzipJsonlReader(LineReader):
+    name = 'JSONL (gzip)'
+    suffixes = ('.jsonl.gz', '.json.gz')
+
+    def _open(self, filepath: str):
+        # GzipFile.seek 向前移动时边解压边丢弃
+        return gzip.open(filepath, 'rb')
+
+
+@register_reader
+class ZstdJsonlReader(LineReader):
+    name = 'JSONL (zstd)'
+    suffixes = ('.jsonl.zst', '.json.zst')
+
+    def _open(self, filepath: str):
+        if zstandard is None:
+            raise ImportError("读取 .zst 文件需要安装 zstandard: pip install zstandard")
+        raw = open(filepath, 'rb')
+        # 多线程压缩（zstd -T / pzstd）的文件由多个帧组成
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader, buffer_size=1024 * 1024)
+
+    def _skip(self, stream, offset: int):
+        while offset > 0:
+            chunk = stream.read(min(offset, 1024 * 1024))
+            if not chunk:
+                break
+            offset -= len(chunk)
+
+
+@register_reader
+class ArrowReader(RecordReader):
+    """Parquet / Arrow IPC（Feather v2）：按记录批次读取，只在内存中保留一个批次"""
+
+    name = 'Parquet/Arrow'
+    suffixes = ('.parquet', '.arrow', '.feather')
+    batch_size = 10000
+
+    def _iter_batches(self, filepath: str):
+        if pyarrow is None:
+            raise ImportError("读取 Parquet/Arrow 文件需要安装 pyarrow: pip install pyarrow")
+        if filepath.lower().endswith('.parquet'):
+            yield from pyarrow.parquet.ParquetFile(filepath).iter_batches(batch_size=self.batch_size)
+            return
+        with pyarrow.memory_map(filepath) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+    def iter_records(self, filepath: str, start_offset: int = 0, start_line: int = 0):
+        position = 0
+        for batch in self._iter_batches(filepath):
+            if position + batch.num_rows <= start_offset:
+                # 续传：整批跳过，不转换为 Python 对象
+                position += batch.num_rows
+                continue
+            for record in batch.to_pylist():
+                position += 1
+                if position > start_offset:
+                    yield start_line + position - start_offset, position, record
@@ -2,14 +2,28 @@
 JSONL 数据处理器：直接读写 JSONL 文件（用于调试）
 
 提供和 DatabaseHandler 相同的接口
+
+追加写模式（默认）：保存和分配时只在文件末尾追加该记录的新版本，同一 model_id
+以最后出现的一行为准；追加的旧版本过多或关闭时，再压缩为每条记录一行的快照
+
+记录不会全部解析进内存：load_data 返回按偏移索引按需解码的记录集合（见 jsonl_index.py）
+
+内存中的数据是权威版本：保存时先改缓存再写文件，不会丢弃缓存；
+文件的 inode、大小或修改时间与最后一次读写后不一致时（被外部修改），才重新加载
+
+写入的持久性：重写文件时先写临时文件、fsync 后再原子替换，崩溃时不会留下截断的文件；
+可选组提交（group_commit 秒）：窗口内的多次保存合并为一次写入和一次 fsync
 """
 
+import atexit
 import json
 import os
-import shutil
-from datetime import datetime
+import threading
 from typing import Dict, Any, List
 
+from .backup_policy import BackupPolicy
+from .jsonl_index import LazyRecords
+
 
 class JSONLItem:
     """JSONL 数据项（模拟 Annotation 对象）"""
@@ -40,15 +54,36 @@ class JSONLItem:
 class JSONLHandler:
     """JSONL 文件处理类（提供和 DatabaseHandler 相同的接口）"""
     
-    def __init__(self, jsonl_path: str):
+    def __init__(self, jsonl_path: str, journal: bool = True, compact_min: int = 1000,
+                 backup_policy: BackupPolicy = None, fsync: bool = True, group_commit: float = 0):
         """
         初始化 JSONL 处理器
         
         Args:
             jsonl_path: JSONL 文件路径
+            journal: 是否使用追加写模式（False 时每次保存都重写整个文件）
+            compact_min: 文件中被覆盖的旧版本行数达到 max(compact_min, 记录数 / 2) 时压缩
+            backup_policy: 重写文件前的备份策略，默认备份到同目录的 backups/
+            fsync: 写入后是否 fsync（确保落盘后才算保存完成）
+            group_commit: 组提交窗口（秒）；大于 0 时保存先记为待写入，窗口结束时统一写入，
+                窗口内进程崩溃会丢失这些修改
         """
         self.jsonl_path = jsonl_path
         self._data_cache = None  # 数据缓存
+        self._records = None  # 按需解码的记录集合（重新加载时复用）
+        self._file_stat = None  # 最后一次读写后文件的 (inode, 大小, 修改时间)
+        self.journal = journal
+        self.compact_min = compact_min
+        self.fsync = fsync
+        self.group_commit = group_commit
+        self._flush_timer = None  # 组提交窗口的定时器
+        self._lock = threading.RLock()
+        self.backup_policy = backup_policy or BackupPolicy(
+            os.path.join(os.path.dirname(jsonl_path), "backups"))
+        
+        if journal or group_commit:
+            # 退出时写入待写入的修改，并把追加的记录压缩为快照
+            atexit.register(self.close)
         
         # 初始化字段处理器
         from .field_processor import FieldProcessor
@@ -60,36 +95,44 @@ class JSONLHandler:
             # 可以添加其他需要特殊处理的字段
         }
     
-    def load_data(self) -> Dict[str, JSONLItem]:
-        """加载所有数据（和 DatabaseHandler.load_data 接口一致）"""
-        if self._data_cache is not None:
-            return self._data_cache
+    def load_data(self) -> LazyRecords:
+        """
+        加载所有数据（和 DatabaseHandler.load_data 接口一致）
         
-        data_dict = {}
+        返回 model_id -> JSONLItem 的按需解码集合：启动时只读取偏移索引，
+        记录在访问时才从文件中解码
+        """
+        if self._data_cache is not None:
+            # 有待写入的修改时以内存为准
+            if self._stat_file() == self._file_stat or (self._records is not None and self._records.dirty):
+                return self._data_cache
+            print(f"🔄 检测到文件被外部修改，重新加载: {self.jsonl_path}")
+            self._data_cache = None
         
         if not os.path.exists(self.jsonl_path):
             print(f"⚠️  文件不存在: {self.jsonl_path}")
-            return data_dict
+            return {}
         
         try:
-            with open(self.jsonl_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # 解析：{"model_id": {属性字典}}
-                    item = json.loads(line)
-                    
-                    for model_id, attrs in item.items():
-                        data_dict[model_id] = JSONLItem(model_id, attrs)
-            
-            self._data_cache = data_dict
-            return data_dict
+            # 解析：{"model_id": {属性字典}}，同一 model_id 以最后一行为准
+            # 重新加载时复用同一个集合，已持有它的调用方（TaskManager.all_data）随之更新
+            records = self._records or LazyRecords(self.jsonl_path, JSONLItem)
+            records.load()
+            self._records = self._data_cache = records
+            self._file_stat = self._stat_file()
+            return records
             
         except Exception as e:
             print(f"❌ 加载 JSONL 失败: {e}")
             return {}
+    
+    def _stat_file(self):
+        """文件的 (inode, 大小, 修改时间)，不存在时返回 None"""
+        try:
+            st = os.stat(self.jsonl_path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
             
     def get_item(self, model_id: str):
         """
@@ -101,9 +144,8 @@ class JSONLHandler:
         Returns:
             JSONLItem对象或None
         """
-        # 如果缓存未加载，先加载
-        if self._data_cache is None:
-            self.load_data()
+        # 加载缓存（已加载时只检查文件是否被外部修改）
+        self.load_data()
             
         # 从缓存中获取
         return self._data_cache.get(model_id)
@@ -139,8 +181,7 @@ class JSONLHandler:
         """
         try:
             # 更新缓存
-            if self._data_cache is None:
-                self._data_cache = self.load_data()
+            self._data_cache = self.load_data()
             
             if model_id not in self._data_cache:
                 return {
@@ -182,11 +223,8 @@ class JSONLHandler:
             # 合并新旧数据
             item.data.update(update_data)
             
-            # 写回文件
-            self._save_to_file()
-            
-            # 清除缓存，确保下次读取时从文件加载最新数据（用于修改检测）
-            self._data_cache = None
+            # 写回文件（缓存保留，下次读取无需重新加载）
+            self._persist(model_id)
             
             return {
                 "success": True,
@@ -212,43 +250,135 @@ class JSONLHandler:
                 "message": error_message
             }
     
+    def _encode_line(self, model_id: str, item: JSONLItem) -> str:
+        """把一条记录编码为 JSONL 的一行"""
+        # 构建完整数据（包含元数据）
+        full_data = {
+            'annotated': item.annotated,
+            'uid': item.uid,
+            'score': item.score,
+        }
+        full_data.update(item.data)
+        
+        # 处理特殊字段
+        for key, value in list(full_data.items()):
+            if key in self.field_configs:
+                field_config = self.field_configs[key]
+                if isinstance(value, str) and field_config.get('process') == 'array_to_string':
+                    full_data[key] = self.field_processor.process_save(field_config, value)
+        
+        # JSONL 格式：{"model_id": {数据}}
+        line_obj = {model_id: full_data}
+        return json.dumps(line_obj, ensure_ascii=False) + '\n'
+    
+    def _persist(self, model_id: str):
+        """持久化一条记录的修改：记为待写入，立即写入或在组提交窗口结束时统一写入"""
+        with self._lock:
+            records = self._data_cache
+            records.mark_dirty(model_id, records[model_id])
+            if not self.group_commit:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.group_commit, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def flush(self):
+        """写入待写入的修改：追加写模式下一次追加所有修改过的记录，否则重写整个文件"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            records = self._records
+            if records is None or not records.dirty:
+                return
+            if not self.journal:
+                self._save_to_file()
+                return
+            
+            buf = bytearray()
+            appended = []
+            with open(self.jsonl_path, 'ab') as f:
+                if not records.ends_with_newline:
+                    f.write(b'\n')
+                offset = f.tell()
+                for model_id, item in records.dirty_items():
+                    line = self._encode_line(model_id, item).encode('utf-8')
+                    appended.append((model_id, item, offset + len(buf), len(line)))
+                    buf += line
+                f.write(buf)
+                self._sync(f)
+            for model_id, item, line_offset, length in appended:
+                records.append_entry(model_id, item, line_offset, length)
+            self._file_stat = self._stat_file()
+            print(f"💾 已追加到: {self.jsonl_path}")
+            
+            if records.superseded >= max(self.compact_min, len(records) // 2):
+                self.compact()
+    
+    def _sync(self, f):
+        """把已写入的内容落盘"""
+        if self.fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _sync_dir(self):
+        """替换文件后让目录项落盘（不支持打开目录的平台跳过）"""
+        if not self.fsync or not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.jsonl_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def compact(self):
+        """把文件压缩为每条记录一行的快照（丢弃被覆盖的旧版本，同时写入待写入的修改）"""
+        with self._lock:
+            dropped = self._data_cache.superseded
+            self._save_to_file()
+            print(f"🗜️  已压缩 JSONL，移除 {dropped} 行旧版本")
+    
     def _save_to_file(self):
-        """将缓存写回 JSONL 文件"""
-        # 备份原文件
-        if os.path.exists(self.jsonl_path):
-            backup_dir = os.path.join(os.path.dirname(self.jsonl_path), "backups")
-            os.makedirs(backup_dir, exist_ok=True)
-            ts = datetime.now().strftime("%Y%m%d_%H%M")
-            backup_file = os.path.join(backup_dir, f"backup_{ts}.jsonl")
-            shutil.copy2(self.jsonl_path, backup_file)
+        """
+        将缓存写回 JSONL 文件（每条记录一行的快照，包含待写入的修改）
         
-        # 写入新数据
-        with open(self.jsonl_path, 'w', encoding='utf-8') as f:
-            for model_id, item in self._data_cache.items():
-                # 构建完整数据（包含元数据）
-                full_data = {
-                    'annotated': item.annotated,
-                    'uid': item.uid,
-                    'score': item.score,
-                }
-                full_data.update(item.data)
-                
-                # 处理特殊字段
-                for key, value in list(full_data.items()):
-                    if key in self.field_configs:
-                        field_config = self.field_configs[key]
-                        if isinstance(value, str) and field_config.get('process') == 'array_to_string':
-                            full_data[key] = self.field_processor.process_save(field_config, value)
-                
-                # 写入 JSONL 格式
-                line_obj = {model_id: full_data}
-                f.write(json.dumps(line_obj, ensure_ascii=False) + '\n')
+        先写临时文件并 fsync，再原子替换：崩溃时原文件保持完整；
+        旧文件也可能仍被 mmap 映射，不能原地截断
+        """
+        # 备份原文件（按策略决定是否备份，去重和清理在后台进行）
+        self.backup_policy.snapshot(self.jsonl_path)
+        
+        # 写入新数据，同时记录每行的偏移
+        records = self._data_cache
+        entries = {}
+        offset = 0
+        tmp = f"{self.jsonl_path}.tmp"
+        with open(tmp, 'wb') as f:
+            for model_id in records:
+                item = records.get(model_id)
+                if item is None:
+                    continue
+                line = self._encode_line(model_id, item).encode('utf-8')
+                f.write(line)
+                entries[model_id] = [offset, len(line), item.uid]
+                offset += len(line)
+            self._sync(f)
+        os.replace(tmp, self.jsonl_path)
+        self._sync_dir()
+        records.replace(entries, offset)
+        records.save_index()
+        self._file_stat = self._stat_file()
         
         print(f"💾 已保存到: {self.jsonl_path}")
     
     def close(self):
-        """关闭（占位方法，保持接口一致）"""
-        pass
+        """关闭：写入待写入的修改，追加写模式下再把追加的记录压缩为快照"""
+        with self._lock:
+            self.flush()
+            records = self.load_data()
+            if isinstance(records, LazyRecords) and records.superseded:
+                self.compact()
         
     def assign_to_user(self, model_id: str, uid: str):
         """
@@ -265,8 +395,7 @@ class JSONLHandler:
         """
         try:
             # 确保缓存已加载
-            if self._data_cache is None:
-                self._data_cache = self.load_data()
+            self._data_cache = self.load_data()
                 
             # 检查记录是否存在
             if model_id not in self._data_cache:
@@ -283,14 +412,15 @@ class JSONLHandler:
                 print(f"⚠️ 数据已被用户 '{current_uid}' 占有，无法分配给 '{uid}'")
                 return False
             
-            # 未被占有或被当前用户占有，可以更新
+            # 已被当前用户占有，无需写入
+            if current_uid == uid:
+                return True
+
+            # 未被占有，可以更新
             item.uid = uid
             
             # 写回文件
-            self._save_to_file()
-            
-            # 清除缓存
-            self._data_cache = None
+            self._persist(model_id)
             
             return True
             
@@ -332,8 +462,7 @@ class JSONLHandler:
         
         try:
             # 确保缓存已加载
-            if self._data_cache is None:
-                self._data_cache = self.load_data()
+            self._data_cache = self.load_data()
                 
             # 筛选数据
             filtered_items = []
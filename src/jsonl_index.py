@@ -0,0 +1,246 @@
+"""
+JSONL 偏移索引：按需解码的记录集合，代替把整个 JSONL 解析进内存的字典
+
+- 索引：model_id -> [字节偏移, 行长度, uid]，顺序与文件中首次出现的顺序一致，
+  同一 model_id 出现多次时以最后一行为准
+- 索引保存在旁路文件 <jsonl>.idx 中，启动时只读索引，不解析记录
+- 文件只在末尾追加过（追加写模式）时，只扫描索引之后新增的部分；
+  被改写过（大小、修改时间或末尾校验不一致）时重新扫描整个文件
+- 记录通过只读 mmap 按行切片、按需解码，只缓存最近使用的一小部分
+- 已修改但尚未写入文件的记录单独保存（不会被缓存淘汰），读取时优先返回
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .paged_index import RecordCache
+
+INDEX_VERSION = 1
+_TAIL_BYTES = 4096  # 末尾校验覆盖的字节数（用于判断文件是否只被追加）
+_REINDEX_LINES = 1000  # 启动时增量扫描超过这么多行时，重写旁路索引
+
+
+def _tail_digest(path: str, size: int) -> str:
+    """文件前 size 字节中最后一段的摘要"""
+    start = max(0, size - _TAIL_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(size - start)).hexdigest()
+
+
+class LazyRecords:
+    """按需解码的 JSONL 记录集合（接口与 model_id -> 记录 的字典一致，线程安全）"""
+
+    def __init__(self, path: str, item_factory: Callable[[str, dict], object], max_items: int = 1024):
+        """
+        Args:
+            path: JSONL 文件路径
+            item_factory: 由 (model_id, 属性字典) 构造记录对象的函数
+            max_items: 最多缓存的已解码记录数
+        """
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.item_factory = item_factory
+        self._entries: Dict[str, List] = {}  # model_id -> [偏移, 长度, uid]
+        self.lines = 0  # 文件总行数
+        self.records = 0  # 解析出的记录数（含已被后续行覆盖的旧版本）
+        self.ends_with_newline = True  # 文件是否以换行结尾（追加前需要补齐）
+        self._size = 0  # 已建立索引的字节数
+        self._mm: Optional[mmap.mmap] = None
+        self._lock = threading.RLock()
+        self._cache = RecordCache(self._decode, max_items)
+        self.dirty: Dict[str, object] = {}  # 尚未写入文件的记录
+
+    # ---------- 索引 ----------
+
+    def load(self):
+        """读取旁路索引，必要时扫描文件中未建立索引的部分"""
+        with self._lock:
+            st = os.stat(self.path)
+            saved = self._read_index()
+            appended_only = (
+                saved is not None
+                and saved['size'] <= st.st_size
+                and (saved['size'] < st.st_size or saved['mtime_ns'] == st.st_mtime_ns)
+                and saved['tail'] == _tail_digest(self.path, saved['size'])
+            )
+            if appended_only:
+                self._entries = {key: [offset, length, uid] for key, offset, length, uid in saved['entries']}
+                self.lines = saved['lines']
+                self.records = saved['records']
+                self.ends_with_newline = saved['newline']
+                self._size = saved['size']
+            else:
+                self._entries, self.lines, self.records, self._size = {}, 0, 0, 0
+                self.ends_with_newline = True
+
+            lines_before = self.lines
+            if self._size < st.st_size:
+                self._scan(self._size)
+            if not appended_only or self.lines - lines_before >= _REINDEX_LINES:
+                self.save_index()
+            self._mm = None
+            self._cache = RecordCache(self._decode, self._cache.max_items)
+
+    def _read_index(self) -> Optional[dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            return saved if saved.get('version') == INDEX_VERSION else None
+        except (OSError, ValueError):
+            return None
+
+    def _scan(self, start: int):
+        """从 start（行首）开始扫描文件，把记录加入索引"""
+        offset = start
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            for raw in f:
+                self.lines += 1
+                line = raw.strip()
+                if line:
+                    try:
+                        obj = json.loads(line)
+                    except ValueError as e:
+                        # 例如追加写入时中断留下的半行
+                        print(f"⚠️  第 {self.lines} 行 JSON 解析错误，已跳过: {e}")
+                    else:
+                        for key, attrs in obj.items():
+                            self._entries[key] = [offset, len(raw), attrs.get('uid', '')]
+                            self.records += 1
+                offset += len(raw)
+                self.ends_with_newline = raw.endswith(b'\n')
+        self._size = offset
+
+    def save_index(self):
+        """写入旁路索引（先写临时文件再原子替换）"""
+        with self._lock:
+            st = os.stat(self.path)
+            saved = {
+                'version': INDEX_VERSION,
+                'size': self._size,
+                'mtime_ns': st.st_mtime_ns,
+                'tail': _tail_digest(self.path, self._size),
+                'lines': self.lines,
+                'records': self.records,
+                'newline': self.ends_with_newline,
+                'entries': [[key, *entry] for key, entry in self._entries.items()],
+            }
+            tmp = f"{self.index_path}.tmp"
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(saved, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp, self.index_path)
+            except OSError as e:
+                print(f"⚠️  写入 JSONL 索引失败: {e}")
+
+    def append_entry(self, key: str, item, offset: int, length: int):
+        """记录已追加到文件末尾的一行（追加写模式保存后调用）"""
+        with self._lock:
+            self._entries[key] = [offset, length, getattr(item, 'uid', '')]
+            self.lines += 1
+            self.records += 1
+            self.ends_with_newline = True
+            self._size = offset + length
+            self._cache[key] = item
+            if self.dirty.get(key) is item:
+                del self.dirty[key]
+
+    def replace(self, entries: Dict[str, List], size: int):
+        """文件已被整体重写（压缩为快照，包含所有待写入的记录）后，换用新的索引"""
+        with self._lock:
+            for key, item in self.dirty.items():
+                self._cache[key] = item
+            self.dirty = {}
+            self._entries = entries
+            self.lines = self.records = len(entries)
+            self.ends_with_newline = True
+            self._size = size
+            self._mm = None
+
+    def mark_dirty(self, key: str, item):
+        """记录已在内存中修改，等待写入文件"""
+        with self._lock:
+            self.dirty[key] = item
+
+    def dirty_items(self) -> List[Tuple[str, object]]:
+        with self._lock:
+            return list(self.dirty.items())
+
+    @property
+    def superseded(self) -> int:
+        """文件中已被后续行覆盖的旧版本行数"""
+        return self.records - len(self._entries)
+
+    # ---------- 按需解码 ----------
+
+    def _mapped(self, end: int) -> mmap.mmap:
+        """返回至少覆盖前 end 字节的只读映射（文件追加后重新映射）"""
+        mm = self._mm
+        if mm is None or len(mm) < end:
+            with self._lock:
+                if self._mm is None or len(self._mm) < end:
+                    with open(self.path, 'rb') as f:
+                        self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                mm = self._mm
+        return mm
+
+    def _decode(self, key: str):
+        # 偏移和映射必须在同一把锁内取得：replace() 换用新文件的索引后，旧偏移在新文件中无效
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            offset, length, _ = entry
+            raw = self._mapped(offset + length)[offset:offset + length]
+        obj = json.loads(raw)
+        return self.item_factory(key, obj[key])
+
+    def owners(self) -> List[Tuple[str, str]]:
+        """[(model_id, uid)]，按文件顺序（构建可见性索引时无需解码记录）"""
+        with self._lock:
+            return [(key, entry[2]) for key, entry in self._entries.items()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key: str, default=None):
+        item = self.dirty.get(key)
+        if item is not None:
+            return item
+        return self._cache.get(key, default)
+
+    def __getitem__(self, key: str):
+        item = self.get(key)
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def __setitem__(self, key: str, item):
+        self._cache[key] = item
+
+    def items(self):
+        """逐条解码的 (model_id, 记录)"""
+        for key in self.keys():
+            item = self.get(key)
+            if item is not None:
+                yield key, item
+
+    def values(self):
+        for _, item in self.items():
+            yield item
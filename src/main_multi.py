@@ -9,6 +9,9 @@ import os
 import sys
 import importlib
 import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import gradio as gr
 from pathlib import Path
 
@@ -18,20 +21,28 @@ sys.path.insert(0, str(project_root))
 
 from src.db_handler import DatabaseHandler
 from src.jsonl_handler import JSONLHandler
+from src.jsonl_index import LazyRecords
 from src.field_processor import FieldProcessor
 from src.component_factory import ComponentFactory
+from src.visibility_index import VisibilityIndex
+from src.paged_index import PagedVisibilityIndex, RecordCache
+from src.image_cache import ImageCache
+from src.path_cache import PathStatusCache, iter_image_refs
 from src.routes import ROUTES, DEFAULT_PORT
 
 
 class TaskManager:
     """任务管理器"""
     
-    def __init__(self, task_config, initial_user_uid="pending_login", debug=False, export_dir="exports", default_allowed_path="/mnt"):
+    def __init__(self, task_config, initial_user_uid="pending_login", debug=False, export_dir="exports", default_allowed_path="/mnt", image_cache=None, paged=False, lease_minutes=0):
         self.task_config = task_config
         self.task_name = task_config['task']
         self.debug = debug
         self.export_dir = export_dir  # 添加导出目录配置，解决硬编码问题
         self.default_allowed_path = default_allowed_path  # 添加默认允许路径，解决硬编码问题
+        self.image_cache = image_cache  # 图片显示尺寸缓存（None 表示直接使用原图）
+        self.paged = paged  # 分页导航模式：可见列表由数据库查询得到，不加载全部记录（仅数据库模式）
+        self.lease_minutes = lease_minutes  # 浏览即占有的租约时长（分钟），0 表示永久占有（仅数据库模式）
         
         # 加载UI配置（新架构）
         config_module = importlib.import_module(f"src.ui_configs.{self.task_name}_config")
@@ -41,6 +52,8 @@ class TaskManager:
         self.ui_config = config_module.UI_CONFIG
         self.task_info = config_module.TASK_INFO
         self.custom_css = getattr(config_module, 'CUSTOM_CSS', '')
+        self.database_config = getattr(config_module, 'DATABASE_CONFIG', {})
+        self.jsonl_config = getattr(config_module, 'JSONL_CONFIG', {})
         
         # 从COMPONENTS中提取字段配置（用于数据处理）
         # 新规则：任何定义了 'data_field' 的组件都将被视为一个需要与数据库交互的字段。
@@ -64,16 +77,36 @@ class TaskManager:
                comp.get('type') == 'slider'
         ]
        
+        # 图片字段（用于批量检查图片路径）
+        self.image_fields = [
+            comp.get('data_field', comp['id'])
+            for comp in self.components_config
+            if comp.get('type') == 'image'
+        ]
+        
         # 数据库路径
         self.db_path = f"databases/{self.task_name}.db"
        
         # 初始化
         self.field_processor = FieldProcessor()
+        self.path_cache = PathStatusCache()  # 所有用户共享的图片路径状态缓存
+        self.visibility = VisibilityIndex()
         self._load_data(initial_user_uid)
+        self._prime_path_cache()
+        
+        # 预取：后台准备当前记录前后两条的加载结果
+        self._load_plan = None
+        self._prefetched = {}    # user_uid -> {model_id: payload}
+        self._generations = {}   # model_id -> 版本号（记录刷新时递增，用于判断预取结果是否过期）
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
         
         # 组件引用
         self.components = {}
         self.factory = None
+        
+        # 最后启动：收回租约时会刷新记录，用到上面的预取状态
+        self._start_lease_reaper()
     
     def _load_data(self, user_uid):
         """加载数据（支持数据库模式和 JSONL debug 模式）"""
@@ -82,7 +115,7 @@ class TaskManager:
             jsonl_file = 'test.jsonl'
             if os.path.exists(jsonl_file):
                 print(f"🐛 Debug 模式: {jsonl_file}")
-                self.data_handler = JSONLHandler(jsonl_file)
+                self.data_handler = JSONLHandler(jsonl_file, **self.jsonl_config)
                 self.data_source = 'jsonl'
             else:
                 print(f"⚠️  Debug 模式：未找到 {jsonl_file}")
@@ -90,7 +123,7 @@ class TaskManager:
                 # 创建空的 test.jsonl
                 with open(jsonl_file, 'w', encoding='utf-8'):
                     pass
-                self.data_handler = JSONLHandler(jsonl_file)
+                self.data_handler = JSONLHandler(jsonl_file, **self.jsonl_config)
                 self.data_source = 'jsonl'
                 self.all_data = {}
                 print(f"   ✓ 已创建空的 {jsonl_file}")
@@ -99,7 +132,8 @@ class TaskManager:
             # 正常模式：使用数据库
             if os.path.exists(self.db_path):
                 print(f"🗄️  数据库模式: {self.db_path}")
-                self.data_handler = DatabaseHandler(self.db_path)
+                self.data_handler = DatabaseHandler(self.db_path, lease_minutes=self.lease_minutes,
+                                                    **self.database_config)
                 self.data_source = 'database'
             else:
                 print(f"❌ 未找到数据库: {self.db_path}")
@@ -109,26 +143,98 @@ class TaskManager:
                 return
         
         # 加载所有数据
+        self._build_index()
+        
+        print(f"✓ 加载完成")
+        print(f"  总数: {len(self.visibility)}, 可见: {self.visibility.count(user_uid)}")
+    
+    def _build_index(self):
+        """构建记录缓存和可见性索引"""
+        if self.paged and self.data_source == 'database':
+            # 分页导航：只按需读取当前位置附近的记录
+            self.all_data = RecordCache(self.data_handler.get_item)
+            self.visibility = PagedVisibilityIndex(self.data_handler)
+            print(f"📄 分页导航模式（按 model_id 排序）")
+            return
         self.all_data = self.data_handler.load_data()
+        self._rebuild_visibility()
+    
+    def _prime_path_cache(self):
+        """后台并行检查所有图片路径，预热路径状态缓存"""
+        # 分页导航模式和按需解码的 JSONL 不做全量预热（否则启动时会读取全部记录），
+        # 图片路径在预取时按需检查
+        if isinstance(self.all_data, (RecordCache, LazyRecords)) or not self.all_data or not self.image_fields:
+            return
         
-        # 过滤可见数据
-        visible_keys = self.get_visible_keys(user_uid)
+        # 在当前线程收集路径，后台线程只做文件系统检查
+        records = ((key, getattr(item, 'data', None)) for key, item in self.all_data.items())
+        paths = [path for _, _, path in iter_image_refs(records, self.image_fields)]
         
-        print(f"✓ 加载完成")
-        print(f"  总数: {len(self.all_data)}, 可见: {len(visible_keys)}")
+        def prime():
+            stats = self.path_cache.prime(paths)
+            print(f"🖼️  图片路径检查完成: {stats['checked']} 张, 缺失 {stats['missing']} 张")
+        
+        threading.Thread(target=prime, name="path-prime", daemon=True).start()
+    
+    def _lease_enabled(self):
+        """是否启用了租约（需要数据处理器支持）"""
+        return bool(self.lease_minutes) and hasattr(self.data_handler, 'renew_lease')
+    
+    def _start_lease_reaper(self):
+        """后台定期收回过期租约，被收回的数据重新对所有用户可见"""
+        if not self._lease_enabled():
+            return
+        interval = max(5, min(60, self.lease_minutes * 30))
+        
+        def reap():
+            while True:
+                try:
+                    released = self.data_handler.release_expired_leases()
+                    for model_id in released:
+                        self._refresh_item(model_id)
+                    if released:
+                        print(f"♻️  收回过期租约: {len(released)} 条")
+                except Exception as e:
+                    print(f"⚠️ 收回过期租约失败: {e}")
+                time.sleep(interval)
+        
+        threading.Thread(target=reap, name="lease-reaper", daemon=True).start()
+        print(f"⏳ 租约已启用: {self.lease_minutes} 分钟")
+    
+    def heartbeat(self, user_uid, model_id):
+        """心跳（界面定时触发）：为用户正在查看的数据续租"""
+        if not model_id or not user_uid or user_uid == "pending_login":
+            return
+        self.data_handler.renew_lease(model_id, user_uid)
+    
+    def _rebuild_visibility(self):
+        """根据 self.all_data 重建可见性索引（仅在全量加载后调用）"""
+        if hasattr(self.all_data, 'owners'):
+            # 按需解码的记录集合直接提供 (model_id, uid)，无需解码全部记录
+            self.visibility = VisibilityIndex(self.all_data.owners())
+            return
+        self.visibility = VisibilityIndex(
+            (key, getattr(item, 'uid', '')) for key, item in self.all_data.items()
+        )
+    
+    def _refresh_item(self, model_id):
+        """
+        从数据源重新读取单条记录，更新内存缓存和可见性索引
+        
+        Returns:
+            更新后的记录，读取失败时返回 None
+        """
+        item = self.data_handler.get_item(model_id)
+        if item:
+            self.all_data[model_id] = item
+            self.visibility.set_owner(model_id, item.uid)
+        # 使该记录已有的预取结果失效
+        self._generations[model_id] = self._generations.get(model_id, 0) + 1
+        return item
     
     def get_visible_keys(self, user_uid):
-        """动态计算并返回用户可见的数据键列表"""
-        if not self.all_data:
-            return []
-        
-        visible_keys = []
-        for key, value in self.all_data.items():
-            attrs = self.data_handler.parse_item(value)
-            item_uid = attrs.get('uid', '')
-            if not item_uid or item_uid == user_uid:
-                visible_keys.append(key)
-        return visible_keys
+        """返回用户可见的数据键列表（由可见性索引维护，不再扫描全部数据）"""
+        return self.visibility.keys(user_uid)
     
     def build_interface(self, demo, user_state, initial_user_uid):
         """
@@ -142,10 +248,9 @@ class TaskManager:
         
         # 用户信息
         if self.ui_config.get('show_user_info'):
-            # 动态计算
-            visible_keys = self.get_visible_keys(initial_user_uid)
-            other_count = len(self.all_data) - len(visible_keys)
-            self.components['user_info'] = gr.HTML(self._render_user_info(len(visible_keys), other_count, initial_user_uid))
+            visible_count = self.visibility.count(initial_user_uid)
+            other_count = len(self.visibility) - visible_count
+            self.components['user_info'] = gr.HTML(self._render_user_info(visible_count, other_count, initial_user_uid))
         
         # State组件
         self.components['current_index'] = gr.State(value=0)
@@ -269,6 +374,9 @@ class TaskManager:
                 if slider_comp and slider_comp not in self.interactive_components:
                     self.interactive_components.append(slider_comp)
 
+        # 预编译加载计划和比较计划，事件处理时不再查找配置
+        self._compile_plans()
+
         # 4. 构建事件的输入列表
         # 用于保存和导航检查的输入列表
         event_inputs = [
@@ -338,6 +446,16 @@ class TaskManager:
             outputs=[self.components['confirm_modal']]
         )
 
+        # 租约心跳：页面打开期间定时为当前数据续租
+        if self._lease_enabled():
+            heartbeat_timer = gr.Timer(value=max(5, min(60, self.lease_minutes * 20)))
+            heartbeat_timer.tick(
+                fn=self.heartbeat,
+                inputs=[core_inputs['user_state'], core_inputs['current_model_id']],
+                outputs=None,
+                show_progress="hidden"
+            )
+
         # 导出
         if 'export_btn' in self.components:
             self.components['export_btn'].click(
@@ -380,129 +498,246 @@ class TaskManager:
         print(f"\n{'='*50}")
         print(f"加载数据: index={index}, user_uid={user_uid}")
         print(f"{'='*50}")
-        visible_keys = self.get_visible_keys(user_uid)
+        visible_count = self.visibility.count(user_uid)
 
         # 确定要加载的数据属性
-        is_valid_item = visible_keys and 0 <= index < len(visible_keys)
+        is_valid_item = 0 <= index < visible_count
         attrs = {}
         model_id = ""
+        payload = None
         if is_valid_item:
-            model_id = visible_keys[index]
+            model_id = self.visibility.key_at(user_uid, index)
+            payload = self._take_prefetched(user_uid, model_id)
             item = self.all_data.get(model_id)
             if item:
-                attrs = self.data_handler.parse_item(item)
+                attrs = payload['attrs'] if payload else self.data_handler.parse_item(item)
                 # 浏览即占有
                 if not attrs.get('uid'):
                     if hasattr(self.data_handler, "assign_to_user"):
-                        self.data_handler.assign_to_user(model_id, user_uid)
-                        # 简单刷新
-                        self.all_data = self.data_handler.load_data()
-                        # 无需再次获取 visible_keys，因为 assign 不会改变可见性
-                        item = self.all_data.get(model_id)
-                        attrs = self.data_handler.parse_item(item) if item else {}
+                        claimed = self.data_handler.assign_to_user(model_id, user_uid)
+                        # 只刷新这一条记录（分配失败时同步为实际占有者）
+                        item = self._refresh_item(model_id) or item
+                        attrs = self.data_handler.parse_item(item)
+                        # 分配成功只改变 uid，预取结果仍可直接使用
+                        if not claimed:
+                            payload = None
 
-        # 根据 self.load_outputs 动态构建返回值
-        result = []
-        # 使用字典存储所有滑块目标字段的原始值，键为字段名
-        original_values = {}
-        for comp in self.load_outputs:
-            comp_id = comp.elem_id
-            
-            # 重新设计的配置查找逻辑
-            is_checkbox = comp_id is not None and comp_id.endswith('_checkbox')
-            lookup_id = comp_id.replace('_checkbox', '') if is_checkbox else comp_id
-            
-            # 处理 current_model_id_state
-            if comp_id is None and isinstance(comp, gr.State) and 'current_model_id_state' in self.components and comp == self.components['current_model_id_state']:
-                result.append(model_id) # 更新State
-                continue
-            
-            comp_config = next((c for c in self.components_config if c['id'] == lookup_id), None)
+        # 按预编译的加载计划构建返回值（顺序与 self.load_outputs 一致）
+        # original_values 由滑块目标字段的取值函数填充，供 original_values_state 使用
+        ctx = {
+            'model_id': model_id,
+            'progress': f"{index + 1} / {visible_count}" if is_valid_item else "0 / 0",
+            'original_values': {},
+        }
+        if payload:
+            result = payload['values']
+            for i in self._progress_output_indices:
+                result[i] = ctx['progress']
+        else:
+            result = [extract(attrs, ctx) for extract in self._load_plan]
+        
+        if is_valid_item:
+            self._prefetch_neighbors(user_uid, index)
+        return result
+    
+    def _prefetch_neighbors(self, user_uid, index):
+        """在后台准备用户可见列表中 index 前后两条记录的加载结果"""
+        if not self._load_plan or user_uid == "pending_login":
+            return
+        
+        targets = [self.visibility.key_at(user_uid, i) for i in (index + 1, index - 1)]
+        targets = [model_id for model_id in targets if model_id]
+        
+        with self._prefetch_lock:
+            cached = self._prefetched.setdefault(user_uid, {})
+            # 只保留当前位置附近的预取结果
+            for model_id in list(cached):
+                if model_id not in targets:
+                    del cached[model_id]
+            pending = [model_id for model_id in targets if model_id not in cached]
+        
+        for model_id in pending:
+            self._prefetch_executor.submit(self._prepare_payload, user_uid, model_id)
+    
+    def _prepare_payload(self, user_uid, model_id):
+        """
+        预取任务（后台线程）：解析记录、处理字段值并检查图片路径
+        
+        进度文本依赖导航时的位置，在取用时再填充
+        """
+        try:
+            generation = self._generations.get(model_id, 0)
+            item = self.all_data.get(model_id)
+            if not item:
+                return
+            attrs = self.data_handler.parse_item(item)
+            ctx = {'model_id': model_id, 'progress': '', 'original_values': {}, 'prefetch': True}
+            values = [extract(attrs, ctx) for extract in self._load_plan]
+            with self._prefetch_lock:
+                self._prefetched.setdefault(user_uid, {})[model_id] = {
+                    'generation': generation,
+                    'attrs': attrs,
+                    'values': values,
+                }
+        except Exception as e:
+            print(f"⚠️ 预取失败: {model_id} - {e}")
+    
+    def _take_prefetched(self, user_uid, model_id):
+        """取出预取结果（只能使用一次），记录在预取后被刷新过则返回 None"""
+        with self._prefetch_lock:
+            payload = self._prefetched.get(user_uid, {}).pop(model_id, None)
+        if payload and payload['generation'] == self._generations.get(model_id, 0):
+            return payload
+        return None
+    
+    def _compile_plans(self):
+        """
+        将组件配置编译为事件处理用的执行计划（在 _bind_events 中执行一次）
+        
+        - self._load_plan: 与 load_outputs 一一对应的取值函数列表
+        - self._interactive_ids: interactive_components 的 elem_id 列表（解析 *values 用）
+        - self._compare_fields: has_real_changes 需要比较的字段
+        - self._status_output_indices: 状态框在 load_outputs 中的位置
+        - self._progress_output_indices: 进度框在 load_outputs 中的位置（预取结果取用时填充）
+        """
+        config_by_id = {c['id']: c for c in self.components_config}
+        slider_by_target = {
+            c['target_field']: c for c in self.components_config
+            if c.get('type') == 'slider' and c.get('target_field')
+        }
+        
+        self._load_plan = [
+            self._compile_extractor(comp, config_by_id, slider_by_target)
+            for comp in self.load_outputs
+        ]
+        self._interactive_ids = [comp.elem_id for comp in self.interactive_components]
+        self._compare_fields = [
+            field for field in self.field_configs
+            if field['key'] != 'model_id'
+            and not field['key'].startswith('_computed_')
+            and field.get('interactive') is not False
+        ]
+        self._status_output_indices = [
+            i for i, comp in enumerate(self.load_outputs)
+            if config_by_id.get(getattr(comp, 'elem_id', None), {}).get('data_field') == '_computed_status'
+        ]
+        self._progress_output_indices = [
+            i for i, comp in enumerate(self.load_outputs)
+            if getattr(comp, 'elem_id', None) == 'progress_box'
+        ]
+    
+    def _compile_extractor(self, comp, config_by_id, slider_by_target):
+        """
+        为单个输出组件生成取值函数 fn(attrs, ctx)
+        
+        Args:
+            comp: load_outputs 中的组件
+            config_by_id: 组件ID -> 组件配置
+            slider_by_target: 滑块目标字段 -> 滑块配置
+        """
+        comp_id = comp.elem_id
+        
+        # 处理 current_model_id_state
+        if comp_id is None and isinstance(comp, gr.State) and comp is self.components.get('current_model_id_state'):
+            return lambda attrs, ctx: ctx['model_id']
+        
+        is_checkbox = comp_id is not None and comp_id.endswith('_checkbox')
+        lookup_id = comp_id.replace('_checkbox', '') if is_checkbox else comp_id
+        comp_config = config_by_id.get(lookup_id)
+        
+        if not comp_config:
+            # 处理特殊组件，如 original_values_state state
+            if comp_id is None and isinstance(comp, gr.State):
+                return lambda attrs, ctx: ctx['original_values']
+            print(f"⚠️ 警告: 未找到组件 '{comp_id}' (lookup_id: '{lookup_id}') 的配置。")
+            return lambda attrs, ctx: gr.update()
+        
+        data_field = comp_config.get('data_field', comp_config['id'])
+        comp_type = comp_config['type']
+        
+        if is_checkbox:
+            chk_key = f"chk_{data_field}"
             
-            if not comp_config:
-                # 处理特殊组件，如 original_values_state state
-                if comp_id is None and isinstance(comp, gr.State):
-                    # 假设这是 original_values_state
-                    result.append(original_values)
-                else:
-                    print(f"⚠️ 警告: 在 load_data 中未找到组件 '{comp_id}' (lookup_id: '{lookup_id}') 的配置。")
-                    result.append(gr.update()) # 或者 gr.update()
-                continue
-
-            data_field = comp_config.get('data_field', comp_config['id'])
-            comp_type = comp_config['type']
-
-            if is_checkbox:
-                # 现在我们已经有了正确的 comp_config
-                field_key = comp_config.get('data_field', comp_config['id'])
-                checkbox_value = attrs.get(f"chk_{field_key}", False)
-                print(f"加载复选框 '{comp_id}' (字段: {field_key}): 数据库值={checkbox_value}")
-                result.append(gr.update(value=checkbox_value))
-            elif data_field == 'model_id':
-                result.append(model_id)
-            elif data_field == '_computed_status':
-                result.append(self._render_status(attrs.get('annotated', False)))
-            elif comp_id == 'progress_box':
-                prog = f"{index + 1} / {len(visible_keys)}" if is_valid_item else "0 / 0"
-                result.append(prog)
-            elif comp_id == 'scale_slider':
-                # 优先从数据库加载，如果没有或无效则默认为1.0
-                value = attrs.get(data_field, 1.0)
+            def extract_checkbox(attrs, ctx):
+                checkbox_value = attrs.get(chk_key, False)
+                if not ctx.get('prefetch'):
+                    print(f"加载复选框 '{comp_id}' (字段: {data_field}): 数据库值={checkbox_value}")
+                return gr.update(value=checkbox_value)
+            return extract_checkbox
+        
+        if data_field == 'model_id':
+            return lambda attrs, ctx: ctx['model_id']
+        
+        if data_field == '_computed_status':
+            return lambda attrs, ctx: self._render_status(attrs.get('annotated', False))
+        
+        if comp_id == 'progress_box':
+            return lambda attrs, ctx: ctx['progress']
+        
+        if comp_id == 'scale_slider':
+            # 优先从数据库加载，如果没有或无效则默认为1.0
+            def extract_scale(attrs, ctx):
                 try:
-                    value = float(value)
+                    return float(attrs.get(data_field, 1.0))
                 except (ValueError, TypeError):
-                    value = 1.0
-                result.append(value)
-            elif comp_type == 'image':
+                    return 1.0
+            return extract_scale
+        
+        if comp_type == 'image':
+            def extract_image(attrs, ctx):
                 img_path = attrs.get(data_field)
-                result.append(img_path if img_path and os.path.exists(img_path) else None)
-            elif comp_type == 'multiselect':
+                if not img_path:
+                    return None
+                st = self.path_cache.stat(img_path)
+                if st is None:
+                    return None
+                if self.image_cache:
+                    # 返回缩小后的显示版本
+                    return self.image_cache.get(img_path, st=st)
+                return img_path
+            return extract_image
+        
+        if comp_type == 'multiselect':
+            choice_key = f"{data_field}_choice"
+            
+            def extract_multiselect(attrs, ctx):
                 value = attrs.get(data_field, [])
                 # 确保 value 是列表格式
                 if not isinstance(value, list):
                     value = [value] if value else []
-                
-                # 获取选项列表
-                choices = attrs.get(f"{data_field}_choice", [])
-                
-                # 修复：确保所有选中的值都在选项列表中
-                # 将 value 中不在 choices 里的项添加到 choices 中
-                # 使用集合操作去重并合并
+                # 确保所有选中的值都在选项列表中（合并去重）
+                choices = attrs.get(choice_key, [])
                 all_choices = list(set(choices).union(set(value)))
-                
-                # 更新组件的值和选项
-                result.append(gr.update(value=value, choices=all_choices))
-            else: # Textbox, etc.
+                return gr.update(value=value, choices=all_choices)
+            return extract_multiselect
+        
+        # 滑块的目标字段：记录原始值，显示缩放后的值
+        if self.has_slider and data_field in self.slider_target_fields:
+            slider_config = slider_by_target.get(data_field)
+            slider_field = slider_config.get('data_field', slider_config['id']) if slider_config else None
+            
+            def extract_slider_target(attrs, ctx):
                 value = attrs.get(data_field, '')
-                
-                # 如果是滑块的目标字段，进行特殊处理
-                if self.has_slider and data_field in self.slider_target_fields:
-                    # 保存原始值到字典中，键为字段名
-                    original_values[data_field] = value
-                    
-                    # 查找对应的滑块组件配置
-                    slider_config = next((c for c in self.components_config
-                                         if c.get('type') == 'slider' and c.get('target_field') == data_field), None)
-                    
-                    if slider_config:
-                        slider_field = slider_config.get('data_field', slider_config['id'])
-                        scale_value = attrs.get(slider_field, 1.0)
-                        try:
-                            scale_value = float(scale_value)
-                        except (ValueError, TypeError):
-                            scale_value = 1.0
-                        
-                        # 调用 scale_dimensions 计算显示值
-                        display_value = self.scale_dimensions(value, scale_value)
-                        result.append(display_value)
-                    else:
-                        # 如果没有找到对应的滑块配置，直接使用原始值
-                        result.append(value)
-                else:
-                    processed_value = self.field_processor.process_load(comp_config, value)
-                    result.append(processed_value)
-
-        return result
+                ctx['original_values'][data_field] = value
+                if slider_field is None:
+                    # 如果没有找到对应的滑块配置，直接使用原始值
+                    return value
+                try:
+                    scale_value = float(attrs.get(slider_field, 1.0))
+                except (ValueError, TypeError):
+                    scale_value = 1.0
+                return self.scale_dimensions(value, scale_value)
+            return extract_slider_target
+        
+        # Textbox, etc.
+        return lambda attrs, ctx: self.field_processor.process_load(comp_config, attrs.get(data_field, ''))
+    
+    def _map_values(self, values):
+        """将事件传入的 *values 按 interactive_components 的顺序映射为 {elem_id: value}"""
+        return {
+            comp_id: values[i] if i < len(values) else None
+            for i, comp_id in enumerate(self._interactive_ids)
+        }
     
     def scale_dimensions(self, original_dims, scale_value):
         """
@@ -547,18 +782,22 @@ class TaskManager:
         根据用户、索引和model_id解析当前记录
         - 优先使用 model_id (来自State)，因为它最可靠
         - 其次使用 index
+        
+        Returns:
+            (resolved_index, resolved_model, visible_count)
         """
-        visible_keys = self.get_visible_keys(user_uid)
+        visible_count = self.visibility.count(user_uid)
         resolved_model = None
         resolved_index = index
 
-        if model_id and model_id in visible_keys:
+        position = self.visibility.position_of(user_uid, model_id) if model_id else None
+        if position is not None:
             resolved_model = model_id
-            resolved_index = visible_keys.index(model_id)
-        elif 0 <= index < len(visible_keys):
-            resolved_model = visible_keys[index]
+            resolved_index = position
+        elif 0 <= index < visible_count:
+            resolved_model = self.visibility.key_at(user_uid, index)
         
-        return resolved_index, resolved_model, visible_keys
+        return resolved_index, resolved_model, visible_count
     
     def save_data(self, user_uid, index, current_model_id, *values):
         """保存数据 (重构版)"""
@@ -576,14 +815,7 @@ class TaskManager:
             values = values[:-1]
 
         # 安全地解析 *values
-        value_map = {}
-        value_idx = 0
-        for comp in self.interactive_components:
-            if value_idx < len(values):
-                value_map[comp.elem_id] = values[value_idx]
-            else:
-                value_map[comp.elem_id] = None # 预防性代码
-            value_idx += 1
+        value_map = self._map_values(values)
 
         attributes = {}
         has_error = False
@@ -657,11 +889,8 @@ class TaskManager:
             # 返回当前数据并显示错误信息
             result = self.load_data(resolved_index, user_uid)
             # 如果状态框在加载的组件中，则替换状态框内容
-            for i, comp in enumerate(self.load_outputs):
-                comp_id = comp.elem_id if hasattr(comp, 'elem_id') else None
-                comp_config = next((c for c in self.components_config if c['id'] == comp_id), None)
-                if comp_config and comp_config.get('data_field') == '_computed_status':
-                    result[i] = error_status_html
+            for i in self._status_output_indices:
+                result[i] = error_status_html
             
             return result
         else:
@@ -670,27 +899,24 @@ class TaskManager:
             
             # 更新内存中的缓存 (self.all_data) 以反映刚刚的保存
             # 这种方法比重新加载所有数据更高效，并能避免潜在的会话缓存问题
-            updated_item = self.data_handler.get_item(resolved_model)
+            updated_item = self._refresh_item(resolved_model)
             if updated_item:
-                self.all_data[resolved_model] = updated_item
                 # 添加调试日志，查看保存后的数据
                 print(f"更新缓存数据: {resolved_model} = {updated_item.to_dict()}")
             else:
                 # 如果由于某种原因找不到项目（不太可能），则回退到完全重新加载
                 print("警告: 无法获取更新后的项目，回退到完全重新加载")
-                self.all_data = self.data_handler.load_data()
+                self._build_index()
             
-            # 重新计算可见键
-            visible_keys = self.get_visible_keys(user_uid)
-            print(f"重新计算可见键: {len(visible_keys)} 个项目")
+            visible_count = self.visibility.count(user_uid)
+            print(f"可见数据: {visible_count} 个项目")
             
             # 确保索引在有效范围内
-            if resolved_model in visible_keys:
-                new_index = visible_keys.index(resolved_model)
-            else:
+            new_index = self.visibility.position_of(user_uid, resolved_model)
+            if new_index is None:
                 # 如果因为某些原因（如数据被其他用户占用）导致当前项不再可见，
                 # 则停留在当前索引或跳转到列表末尾
-                new_index = min(index, len(visible_keys) - 1) if visible_keys else 0
+                new_index = min(index, visible_count - 1) if visible_count else 0
             print(f"新索引: {new_index}")
             
             # 返回更新后的数据
@@ -717,13 +943,10 @@ class TaskManager:
         
         search_value = search_value.strip()
         
-        # 确保visible_keys是最新的
-        visible_keys = self.get_visible_keys(user_uid)
-        
-        # 查找 model_id（在 visible_keys 中）
-        if search_value in visible_keys:
+        # 查找 model_id（在用户可见列表中）
+        new_index = self.visibility.position_of(user_uid, search_value)
+        if new_index is not None:
             # 找到了，跳转到该索引
-            new_index = visible_keys.index(search_value)
             print(f"🔍 搜索成功: {search_value} (索引 {new_index})")
             return [new_index] + self.load_data(new_index, user_uid)
         else:
@@ -752,29 +975,14 @@ class TaskManager:
             values = values[:-1]
 
         # 安全地解析 *values
-        value_map = {}
-        value_idx = 0
-        for comp in self.interactive_components:
-            if value_idx < len(values):
-                value_map[comp.elem_id] = values[value_idx]
-            else:
-                value_map[comp.elem_id] = None
-            value_idx += 1
+        value_map = self._map_values(values)
 
-        # 迭代 self.field_configs 来进行比较
-        for field in self.field_configs:
+        # 迭代预编译的比较字段（已排除 model_id、计算字段和只读字段）
+        for field in self._compare_fields:
             field_id = field['id']
             field_key = field['key']
             field_type = field['type']
 
-            # 忽略 model_id 字段的变化
-            if field_key == 'model_id':
-                continue
-                
-            # 忽略计算字段和只读字段的变化
-            if field_key.startswith('_computed_') or field.get('interactive') is False:
-                continue
-
             # 比较字段值
             original_value = attrs.get(field_key, '')
             # 使用 process_load 处理原始值，确保与UI显示格式一致
@@ -878,17 +1086,17 @@ class TaskManager:
     
     def _go_direction(self, user_uid, index, current_model_id, direction):
         """根据方向导航, 返回 (new_index, new_model_id)"""
-        resolved_index, _, visible_keys = self._resolve_model(user_uid, index, current_model_id)
+        resolved_index, _, visible_count = self._resolve_model(user_uid, index, current_model_id)
         
-        if not visible_keys:
+        if not visible_count:
             return 0, ""
             
         if direction == "prev":
             new_index = max(0, resolved_index - 1)
         else:
-            new_index = min(len(visible_keys) - 1, resolved_index + 1)
+            new_index = min(visible_count - 1, resolved_index + 1)
         
-        new_model_id = visible_keys[new_index] if new_index < len(visible_keys) else ""
+        new_model_id = self.visibility.key_at(user_uid, new_index) or ""
         return new_index, new_model_id
     
     def save_and_continue_nav(self, direction, user_uid, index, current_model_id, *values):
@@ -986,13 +1194,17 @@ class TaskManager:
         从数据库数据中提取允许访问的基础路径（用于Gradio的allowed_paths）
         
         从image_url字段中提取第一个路径段，适配不同项目的路径结构
+        启用图片缓存时，缓存目录也会加入允许路径
         """
+        cache_paths = [self.image_cache.cache_dir] if self.image_cache and self.image_cache.enabled else []
+        
         # 如果数据库为空，使用配置的默认路径
-        if not self.all_data:
-            return [self.default_allowed_path]
+        first_key = self.visibility.first_key()
+        first_item = self.all_data.get(first_key) if first_key else None
+        if not first_item:
+            return [self.default_allowed_path] + cache_paths
         
         # 从第一个数据项的image_url中提取基础路径
-        first_item = list(self.all_data.values())[0]
         attrs = self.data_handler.parse_item(first_item)
         image_url = attrs.get('image_url', '')
         
@@ -1004,13 +1216,14 @@ class TaskManager:
             parts = image_url.split('/')
             if len(parts) >= 2 and parts[1]:
                 base_path = f"/{parts[1]}"
-                return [base_path]
+                return [base_path] + cache_paths
         
         # 如果没有找到有效路径，使用默认值
-        return [self.default_allowed_path]
+        return [self.default_allowed_path] + cache_paths
 
 
-def create_login_interface(auth_handler, task_config, debug, dev_user=None, export_dir="exports"):
+def create_login_interface(auth_handler, task_config, debug, dev_user=None, export_dir="exports", image_cache=None,
+                           paged=False, lease_minutes=0):
     """
     创建统一的登录和标注界面，登录成功后直接切换显示
     
@@ -1020,11 +1233,15 @@ def create_login_interface(auth_handler, task_config, debug, dev_user=None, expo
         debug: 是否为调试模式
         dev_user: 开发模式用户，如果指定则自动跳过登录
         export_dir: 导出目录路径，默认为 "exports"
+        image_cache: 图片缓存（ImageCache），None 表示直接使用原图
+        paged: 是否使用分页导航模式（不加载全部记录）
+        lease_minutes: 浏览即占有的租约时长（分钟），0 表示永久占有
     """
     
     # 统一创建任务管理器，使用 dev_user 或一个临时的占位用户
     initial_user = dev_user if dev_user else "pending_login"
-    manager = TaskManager(task_config, initial_user_uid=initial_user, debug=debug, export_dir=export_dir)
+    manager = TaskManager(task_config, initial_user_uid=initial_user, debug=debug, export_dir=export_dir,
+                          image_cache=image_cache, paged=paged, lease_minutes=lease_minutes)
 
     # 如果数据未初始化，直接返回错误提示
     if not manager.data_handler:
@@ -1067,13 +1284,10 @@ def create_login_interface(auth_handler, task_config, debug, dev_user=None, expo
             result = auth_handler.login(username, password)
             if result["success"]:
                 username_value = result["user"]["username"]
-                # 重新计算可见数据, 传递用户ID
-                visible_keys = manager.get_visible_keys(username_value)
-                
                 base_return = [gr.update(value="登录成功", visible=False), gr.update(visible=False), gr.update(visible=True), username_value]
                 if has_user_info:
-                    visible_count = len(visible_keys)
-                    other_count = len(manager.all_data) - visible_count
+                    visible_count = manager.visibility.count(username_value)
+                    other_count = len(manager.visibility) - visible_count
                     user_info_html = manager._render_user_info(visible_count, other_count, username_value)
                     base_return.append(gr.update(value=user_info_html))
                 return tuple(base_return)
@@ -1124,6 +1338,13 @@ def main():
     default_export_dir = str(project_root / 'exports')
     parser.add_argument('--export-dir', type=str, default=default_export_dir, help='导出目录路径（默认为项目根目录下的 exports）')
     parser.add_argument('--list-tasks', action='store_true', help='列出所有可用任务')
+    # 图片缓存：向浏览器发送缩小后的图片
+    parser.add_argument('--image-max-size', type=int, default=0, help='图片显示版本的最长边（像素），0（默认）表示直接使用原图；启用需要安装 Pillow，缩小版本写入 --image-cache-dir')
+    parser.add_argument('--image-cache-dir', type=str, default=str(project_root / 'cache' / 'images'), help='图片缓存目录')
+    parser.add_argument('--image-cache-mb', type=int, default=2048, help='图片缓存大小上限（MB）')
+    parser.add_argument('--paged', action='store_true', help='分页导航：按需从数据库读取记录，不全部加载到内存（适合大任务，可见列表按 model_id 排序）')
+    parser.add_argument('--lease-minutes', type=float, default=0, help='浏览即占有的租约时长（分钟）：未标注的数据在页面关闭后到期收回，0 表示永久占有')
+    parser.add_argument('--concurrency', type=int, default=1, help='同时处理的请求数（多人同时标注时可调大）')
     
     args = parser.parse_args()
     
@@ -1165,6 +1386,12 @@ def main():
     if args.port is None:
         args.port = task_config.get('port', DEFAULT_PORT)
     
+    # 图片缓存
+    image_cache = None
+    if args.image_max_size > 0:
+        image_cache = ImageCache(args.image_cache_dir, max_size=args.image_max_size,
+                                 max_bytes=args.image_cache_mb * 1024 * 1024)
+    
     # 判断是否需要登录
     if args.dev:
         # 开发模式：跳过登录，直接使用指定用户
@@ -1181,7 +1408,8 @@ def main():
         # 创建登录界面（即使是开发模式也使用统一界面，只是自动登录）
         from src.auth_handler import AuthHandler
         auth_handler = AuthHandler()
-        demo, manager = create_login_interface(auth_handler, task_config, args.debug, dev_user=user_uid, export_dir=args.export_dir)
+        demo, manager = create_login_interface(auth_handler, task_config, args.debug, dev_user=user_uid, export_dir=args.export_dir,
+                                               image_cache=image_cache, paged=args.paged, lease_minutes=args.lease_minutes)
         
         # 如果 manager 为 None，说明数据库未初始化，直接退出
         if manager is None:
@@ -1191,6 +1419,7 @@ def main():
         allowed_paths = manager.get_allowed_paths()
         
         # 启动服务
+        demo.queue(default_concurrency_limit=args.concurrency)
         demo.launch(
             server_port=args.port,
             server_name="0.0.0.0",
@@ -1211,7 +1440,8 @@ def main():
         print(f"{'='*60}\n")
         
         # 创建登录界面
-        demo, manager = create_login_interface(auth_handler, task_config, args.debug, export_dir=args.export_dir)
+        demo, manager = create_login_interface(auth_handler, task_config, args.debug, export_dir=args.export_dir,
+                                               image_cache=image_cache, paged=args.paged, lease_minutes=args.lease_minutes)
         
         # 如果 manager 为 None，说明数据库未初始化，直接退出
         if manager is None:
@@ -1221,6 +1451,7 @@ def main():
         allowed_paths = manager.get_allowed_paths()
         
         # 启动服务
+        demo.queue(default_concurrency_limit=args.concurrency)
         demo.launch(
             server_port=args.port,
             server_name="0.0.0.0",
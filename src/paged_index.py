@@ -0,0 +1,197 @@
+"""
+分页可见性索引：由数据库查询支撑的用户可见列表（不把全部记录加载到内存）
+
+与 VisibilityIndex 接口一致，可见规则相同：
+- 未分配（uid 为空）的数据对所有用户可见
+- 已分配的数据只对占有者可见
+
+不同之处：
+- 可见列表按 model_id 排序（keyset 分页的键），而不是导入顺序
+- 每个用户只缓存当前位置附近的一段连续数据键（最多两页）；前后翻页用 model_id 做
+  keyset 查询并扩展这一段，随机跳转才使用 OFFSET
+- 记录本身由 RecordCache 按需读取，只保留最近使用的一小部分
+"""
+
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class PagedVisibilityIndex:
+    """基于数据库查询的用户可见数据索引"""
+
+    def __init__(self, data_handler, page_size: int = 100):
+        """
+        Args:
+            data_handler: 数据库处理器（需提供 count_visible / visible_keys / get_owner 等查询）
+            page_size: 每次查询的数据键数量
+        """
+        self.data_handler = data_handler
+        self.page_size = page_size
+        self._pages: Dict[str, Tuple[int, List[str]]] = {}  # uid -> (起始下标, 连续的数据键，最多两页)
+        self._total: Optional[int] = None
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        # 运行期间不会新增或删除记录，总数只查询一次
+        if self._total is None:
+            self._total = self.data_handler.count_all()
+        return self._total
+
+    def __contains__(self, key: str) -> bool:
+        return self.owner(key) is not None
+
+    def owner(self, key: str) -> Optional[str]:
+        """返回数据的占有者（'' 表示未分配，None 表示不存在）"""
+        return self.data_handler.get_owner(key)
+
+    def count(self, user_uid: str) -> int:
+        """用户可见的数据数量"""
+        return self.data_handler.count_visible(user_uid)
+
+    def is_visible(self, user_uid: str, key: str) -> bool:
+        """数据是否对用户可见"""
+        owner = self.owner(key)
+        return owner is not None and (not owner or owner == user_uid)
+
+    def first_key(self) -> Optional[str]:
+        """第一条数据键（按 model_id 顺序）"""
+        return self.data_handler.first_key()
+
+    def position_of(self, user_uid: str, key: str) -> Optional[int]:
+        """
+        返回数据键在用户可见列表中的下标
+
+        Returns:
+            下标，不可见或不存在时返回 None
+        """
+        with self._lock:
+            page = self._pages.get(user_uid)
+            if page and key in page[1]:
+                return page[0] + page[1].index(key)
+
+        if not self.is_visible(user_uid, key):
+            return None
+        position = self.data_handler.count_visible(user_uid, before=key)
+        # 以该记录为锚点，随后的前后翻页可以直接走 keyset 查询
+        with self._lock:
+            self._pages[user_uid] = (position, [key])
+        return position
+
+    def key_at(self, user_uid: str, index: int) -> Optional[str]:
+        """返回用户可见列表中第 index 个数据键"""
+        if index < 0:
+            return None
+
+        with self._lock:
+            page = self._pages.get(user_uid)
+        if page:
+            start, keys = page
+            if start <= index < start + len(keys):
+                return keys[index - start]
+            # 前后翻页时扩展而不是替换缓存的一段：预取会同时访问当前位置前后两条，
+            # 替换会让紧邻翻页边界的另一侧落到随机跳转（OFFSET）上
+            if index == start + len(keys):
+                # 向后翻页，超出两页时丢弃最前面的部分
+                more = self.data_handler.visible_keys(user_uid, after=keys[-1], limit=self.page_size)
+                if not more:
+                    return None
+                keys = keys + more
+                drop = max(0, len(keys) - 2 * self.page_size)
+                return self._set_page(user_uid, start + drop, keys[drop:], index)
+            if index == start - 1:
+                # 向前翻页，超出两页时丢弃最后面的部分
+                more = self.data_handler.visible_keys(user_uid, before=keys[0], limit=self.page_size,
+                                                      descending=True)
+                if not more:
+                    return None
+                more.reverse()
+                keys = (more + keys)[:2 * self.page_size]
+                return self._set_page(user_uid, start - len(more), keys, index)
+
+        # 随机跳转
+        keys = self.data_handler.visible_keys(user_uid, offset=index, limit=self.page_size)
+        return self._set_page(user_uid, index, keys)
+
+    def _set_page(self, user_uid: str, start: int, keys: List[str],
+                  index: Optional[int] = None) -> Optional[str]:
+        """缓存一页数据键，并返回其中第 index 个（默认为第一个）"""
+        if not keys:
+            return None
+        with self._lock:
+            self._pages[user_uid] = (start, keys)
+        return keys[(start if index is None else index) - start]
+
+    def keys(self, user_uid: str) -> List[str]:
+        """返回用户可见的完整数据键列表（按 model_id 顺序）"""
+        return self.data_handler.visible_keys(user_uid)
+
+    def set_owner(self, key: str, user_uid: Optional[str]) -> bool:
+        """
+        数据的占有者已在数据库中更新（分配、保存后调用），丢弃受影响的缓存页
+
+        数据库是唯一的数据来源，这里不知道原占有者，保守地处理：
+        - 新占有者的页中已包含该数据时，其可见列表不变
+        - 其他用户的页只有在数据键位于该页末尾之后时才不受影响
+        """
+        new_uid = user_uid or ''
+        with self._lock:
+            for page_uid, (start, keys) in list(self._pages.items()):
+                if key in keys:
+                    if new_uid and page_uid == new_uid:
+                        continue
+                elif new_uid and key > keys[-1]:
+                    continue
+                del self._pages[page_uid]
+        return True
+
+
+class RecordCache:
+    """按需读取的记录缓存（LRU，线程安全），在分页导航模式下代替 all_data 字典"""
+
+    def __init__(self, loader: Callable[[str], object], max_items: int = 1024):
+        """
+        Args:
+            loader: 按 model_id 读取单条记录的函数，不存在时返回 None
+            max_items: 最多缓存的记录数
+        """
+        self.loader = loader
+        self.max_items = max_items
+        self._items: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __setitem__(self, key: str, item):
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key: str, default=None):
+        """读取记录（未缓存时从数据源读取）"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                return item
+        item = self.loader(key)
+        if item is None:
+            return default
+        self[key] = item
+        return item
+
+    def values(self):
+        """已缓存的记录"""
+        with self._lock:
+            return list(self._items.values())
+
+    def items(self):
+        """已缓存的 (model_id, 记录)"""
+        with self._lock:
+            return list(self._items.items())
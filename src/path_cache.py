@@ -0,0 +1,150 @@
+"""
+路径状态缓存：缓存图片文件的 stat 结果，减少网络文件系统上的元数据请求
+
+- 同一进程内所有用户共享，结果在 TTL 内有效（不存在的结果使用较短的 TTL）
+- 支持启动时/导入后批量并行预热
+- 提供按任务统计缺失图片的报告
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+_MISSING = None
+
+
+def iter_image_refs(records: Iterable[Tuple[str, dict]],
+                    fields: Optional[List[str]] = None) -> Iterator[Tuple[str, str, str]]:
+    """
+    从记录中提取图片引用
+
+    Args:
+        records: (model_id, 业务数据字典) 序列
+        fields: 图片字段列表，为空时使用所有以 image_url 开头的字段
+
+    Yields:
+        (model_id, 字段名, 图片路径)
+    """
+    for model_id, data in records:
+        if not data:
+            continue
+        keys = fields if fields else [k for k in data if k.startswith('image_url')]
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value, str) and value:
+                yield model_id, key, value
+
+
+class PathStatusCache:
+    """路径状态缓存（线程安全）"""
+
+    def __init__(self, ttl: float = 600, negative_ttl: float = 60):
+        """
+        Args:
+            ttl: 文件存在时结果的有效期（秒）
+            negative_ttl: 文件不存在时结果的有效期（秒）
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[str, Tuple[float, Optional[os.stat_result]]] = {}
+        self._lock = threading.Lock()
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """返回路径的 stat 结果（可能来自缓存），不存在返回 None"""
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry and entry[0] > now:
+            return entry[1]
+        return self._refresh(path, now)
+
+    def exists(self, path: str) -> bool:
+        """路径是否存在（可能来自缓存）"""
+        return bool(path) and self.stat(path) is not _MISSING
+
+    def _refresh(self, path: str, now: float) -> Optional[os.stat_result]:
+        try:
+            st = os.stat(path)
+            expiry = now + self.ttl
+        except OSError:
+            st = _MISSING
+            expiry = now + self.negative_ttl
+        with self._lock:
+            self._entries[path] = (expiry, st)
+        return st
+
+    def invalidate(self, path: Optional[str] = None):
+        """使缓存失效（不指定路径则清空全部）"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def prime(self, paths: Iterable[str], workers: int = 16) -> Dict[str, int]:
+        """
+        并行预热缓存
+
+        Returns:
+            {'checked': 检查数, 'missing': 缺失数}
+        """
+        stats = {'checked': 0, 'missing': 0}
+        paths = iter(paths)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                batch = list(islice(paths, 1000))
+                if not batch:
+                    break
+                now = time.monotonic()
+                for st in executor.map(lambda p: self._refresh(p, now), batch):
+                    stats['checked'] += 1
+                    if st is _MISSING:
+                        stats['missing'] += 1
+        return stats
+
+    def missing_report(self, records: Iterable[Tuple[str, dict]], fields: Optional[List[str]] = None,
+                       workers: int = 16) -> dict:
+        """
+        并行检查所有图片，统计缺失情况
+
+        Args:
+            records: (model_id, 业务数据字典) 序列
+            fields: 图片字段列表，为空时使用所有以 image_url 开头的字段
+
+        Returns:
+            {
+                'checked': 检查的图片数,
+                'missing': 缺失的图片数,
+                'by_field': {字段名: 缺失数},
+                'missing_items': [(model_id, 字段名, 路径)]
+            }
+        """
+        report = {'checked': 0, 'missing': 0, 'by_field': {}, 'missing_items': []}
+        refs = iter_image_refs(records, fields)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                batch = list(islice(refs, 1000))
+                if not batch:
+                    break
+                now = time.monotonic()
+                results = executor.map(lambda ref: self._refresh(ref[2], now), batch)
+                for ref, st in zip(batch, results):
+                    report['checked'] += 1
+                    if st is _MISSING:
+                        report['missing'] += 1
+                        report['by_field'][ref[1]] = report['by_field'].get(ref[1], 0) + 1
+                        report['missing_items'].append(ref)
+        return report
+
+
+def print_missing_report(report: dict, limit: int = 20):
+    """打印缺失图片报告"""
+    print(f"🖼️  检查图片: {report['checked']} 张, 缺失: {report['missing']} 张")
+    for field, count in sorted(report['by_field'].items()):
+        print(f"  {field:20s}: 缺失 {count} 张")
+    for model_id, field, path in report['missing_items'][:limit]:
+        print(f"  ❌ {model_id} | {field} | {path}")
+    if report['missing'] > limit:
+        print(f"  ... 还有 {report['missing'] - limit} 条")
@@ -199,6 +199,24 @@ UI_CONFIG = {
     "show_status": True,
 }
 
+# ============ 数据库配置 ============
+# 传给 DatabaseHandler 的参数，均可省略
+DATABASE_CONFIG = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    # SQLite PRAGMA 覆盖项，未列出的使用 db_models.DEFAULT_SQLITE_PRAGMAS
+    "pragmas": {
+        # "cache_size": -131072,   # 页缓存 128MB
+        # "mmap_size": 0,          # 关闭内存映射
+    },
+}
+
+# Debug 模式（JSONL 文件）的写入配置，对应 JSONLHandler 的参数
+JSONL_CONFIG = {
+    "fsync": True,           # 写入后 fsync，确保落盘后才算保存完成
+    "group_commit": 0,       # 组提交窗口（秒）：大于 0 时窗口内的多次保存合并为一次写入
+}
+
 # CSS配置
 CUSTOM_CSS = """
 /* 全局：响应式布局 */
@@ -0,0 +1,169 @@
+"""
+可见性索引：维护每个用户可见的数据键（增量更新）
+
+可见规则与原来的 get_visible_keys 一致：
+- 未分配（uid 为空）的数据对所有用户可见
+- 已分配的数据只对占有者可见
+- 可见列表的顺序与 all_data 的原始顺序一致
+
+实现方式：
+- 每条数据在构建时获得一个固定位置（原始顺序下标）
+- 未分配池和每个占有者各自维护一个有序的位置列表
+- 用户可见列表 = 未分配池 ∪ 该用户的列表（两个有序列表的归并）
+- 多个用户的请求并发处理时，读写通过可重入锁串行化
+"""
+
+from bisect import bisect_left, insort
+from heapq import merge
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class VisibilityIndex:
+    """用户可见数据索引"""
+
+    def __init__(self, entries: Iterable[Tuple[str, Optional[str]]] = ()):
+        """
+        构建索引
+
+        Args:
+            entries: (model_id, uid) 序列，顺序即可见列表的顺序
+        """
+        self._keys: List[str] = []           # 位置 -> model_id
+        self._pos: Dict[str, int] = {}       # model_id -> 位置
+        self._owner_of: List[str] = []       # 位置 -> uid（'' 表示未分配）
+        self._unassigned: List[int] = []     # 未分配池（有序位置列表）
+        self._owned: Dict[str, List[int]] = {}  # uid -> 有序位置列表
+        self._lock = RLock()
+
+        for key, uid in entries:
+            uid = uid or ''
+            pos = len(self._keys)
+            self._keys.append(key)
+            self._pos[key] = pos
+            self._owner_of.append(uid)
+            # 位置单调递增，直接追加即保持有序
+            self._bucket(uid).append(pos)
+
+    def _bucket(self, uid: str) -> List[int]:
+        """获取 uid 对应的位置列表（'' 为未分配池）"""
+        if not uid:
+            return self._unassigned
+        return self._owned.setdefault(uid, [])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pos
+
+    def owner(self, key: str) -> Optional[str]:
+        """返回数据的占有者（'' 表示未分配，None 表示不存在）"""
+        with self._lock:
+            pos = self._pos.get(key)
+            return None if pos is None else self._owner_of[pos]
+
+    def count(self, user_uid: str) -> int:
+        """用户可见的数据数量，O(1)"""
+        with self._lock:
+            owned = self._owned.get(user_uid, []) if user_uid else []
+            return len(self._unassigned) + len(owned)
+
+    def is_visible(self, user_uid: str, key: str) -> bool:
+        """数据是否对用户可见，O(1)"""
+        with self._lock:
+            pos = self._pos.get(key)
+            if pos is None:
+                return False
+            owner = self._owner_of[pos]
+            return not owner or owner == user_uid
+
+    def first_key(self) -> Optional[str]:
+        """第一条数据键（原始顺序）"""
+        with self._lock:
+            return self._keys[0] if self._keys else None
+
+    def position_of(self, user_uid: str, key: str) -> Optional[int]:
+        """
+        返回数据键在用户可见列表中的下标，O(log N)
+
+        Returns:
+            下标，不可见或不存在时返回 None
+        """
+        with self._lock:
+            if not self.is_visible(user_uid, key):
+                return None
+            pos = self._pos[key]
+            owned = self._owned.get(user_uid, []) if user_uid else []
+            return bisect_left(self._unassigned, pos) + bisect_left(owned, pos)
+
+    def key_at(self, user_uid: str, index: int) -> Optional[str]:
+        """
+        返回用户可见列表中第 index 个数据键，O(log N)
+
+        在两个有序位置列表（未分配池、用户列表）上做第 k 小元素的二分查找，
+        不需要真正归并出整个列表。
+        """
+        with self._lock:
+            a = self._unassigned
+            b = self._owned.get(user_uid, []) if user_uid else []
+            if index < 0 or index >= len(a) + len(b):
+                return None
+
+            # i 为前 index+1 个元素中来自 a 的数量
+            need = index + 1
+            lo, hi = max(0, need - len(b)), min(need, len(a))
+            while True:
+                i = (lo + hi) // 2
+                j = need - i
+                if i > 0 and j < len(b) and a[i - 1] > b[j]:
+                    hi = i - 1
+                elif j > 0 and i < len(a) and b[j - 1] > a[i]:
+                    lo = i + 1
+                else:
+                    break
+
+            candidates = []
+            if i > 0:
+                candidates.append(a[i - 1])
+            if j > 0:
+                candidates.append(b[j - 1])
+            return self._keys[max(candidates)]
+
+    def keys(self, user_uid: str) -> List[str]:
+        """返回用户可见的完整数据键列表（按原始顺序）"""
+        with self._lock:
+            owned = self._owned.get(user_uid, []) if user_uid else []
+            return [self._keys[pos] for pos in merge(self._unassigned, owned)]
+
+    def set_owner(self, key: str, user_uid: Optional[str]) -> bool:
+        """
+        更新数据的占有者（分配、保存后调用）
+
+        Args:
+            key: 数据键
+            user_uid: 新的占有者，空值表示退回未分配池
+
+        Returns:
+            bool: 索引是否发生了变化
+        """
+        with self._lock:
+            pos = self._pos.get(key)
+            if pos is None:
+                return False
+
+            new_uid = user_uid or ''
+            old_uid = self._owner_of[pos]
+            if old_uid == new_uid:
+                return False
+
+            old_bucket = self._bucket(old_uid)
+            del old_bucket[bisect_left(old_bucket, pos)]
+            if old_uid and not old_bucket:
+                del self._owned[old_uid]
+
+            insort(self._bucket(new_uid), pos)
+            self._owner_of[pos] = new_uid
+            return True
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+图片路径检查工具
+
+并行检查任务数据库中所有图片路径，报告缺失的图片
+
+使用方式：
+    python tools/check_images.py --task part_annotation
+    python tools/check_images.py --all
+    python tools/check_images.py --db databases/custom.db --output missing.jsonl
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.importers.generic_importer import GenericImporter
+
+
+def check_db(db_path, workers=16, output=None):
+    """检查单个数据库"""
+    if not os.path.exists(db_path):
+        print(f"❌ 数据库不存在: {db_path}")
+        return None
+
+    report = GenericImporter().check_images(db_path, workers=workers)
+
+    if output and report['missing_items']:
+        with open(output, 'a', encoding='utf-8') as f:
+            for model_id, field, path in report['missing_items']:
+                f.write(json.dumps({'db': db_path, 'model_id': model_id, 'field': field, 'path': path},
+                                   ensure_ascii=False) + '\n')
+        print(f"📝 缺失清单已写入: {output}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='检查任务数据库中的图片路径')
+    parser.add_argument('--task', help='任务名称（使用 databases/<task>.db）')
+    parser.add_argument('--db', help='数据库路径')
+    parser.add_argument('--all', action='store_true', help='检查 routes.py 中的所有任务')
+    parser.add_argument('--workers', type=int, default=16, help='并行线程数')
+    parser.add_argument('--output', help='将缺失清单追加写入 JSONL 文件')
+
+    args = parser.parse_args()
+
+    if args.all:
+        from src.routes import ROUTES
+        db_paths = [str(project_root / 'databases' / f"{route['task']}.db") for route in ROUTES]
+    elif args.db:
+        db_paths = [args.db]
+    elif args.task:
+        db_paths = [str(project_root / 'databases' / f'{args.task}.db')]
+    else:
+        parser.error("请指定 --task、--db 或 --all")
+
+    print("🔍 图片路径检查")
+    print("=" * 60)
+    for db_path in db_paths:
+        check_db(db_path, workers=args.workers, output=args.output)
+    print("=" * 60)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+图片缓存预热工具
+
+遍历任务数据库中所有 image_url* 字段，预先生成缩小后的显示版本，
+避免标注时第一次打开图片才生成缩略图
+
+使用方式：
+    python tools/warm_image_cache.py --task part_annotation
+    python tools/warm_image_cache.py --db databases/custom.db --workers 16 --max-size 768
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.db_models import Annotation, get_session
+from src.image_cache import ImageCache
+
+
+def iter_image_paths(db_path):
+    """逐行读取数据库，产出所有图片路径（不一次性加载全部记录）"""
+    session = get_session(db_path)
+    try:
+        for (data,) in session.query(Annotation.data).yield_per(1000):
+            if not data:
+                continue
+            for key, value in data.items():
+                if key.startswith('image_url') and isinstance(value, str) and value:
+                    yield value
+    finally:
+        session.close()
+
+
+def warm_cache(db_path, cache_dir, max_size, max_mb, workers):
+    """预热图片缓存"""
+    if not os.path.exists(db_path):
+        print(f"❌ 数据库不存在: {db_path}")
+        return
+
+    print("🔥 图片缓存预热")
+    print("=" * 60)
+    print(f"🗄️  数据库: {db_path}")
+    print(f"📁 缓存目录: {cache_dir}")
+    print(f"📐 最长边: {max_size}px, 线程数: {workers}")
+
+    cache = ImageCache(cache_dir, max_size=max_size, max_bytes=max_mb * 1024 * 1024)
+    if not cache.enabled:
+        return
+
+    stats = cache.warm(iter_image_paths(db_path), workers=workers)
+
+    print("\n" + "=" * 60)
+    print(f"✅ 预热完成")
+    print(f"  已缓存: {stats['cached']}")
+    print(f"  原图缺失: {stats['missing']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='预热图片缓存')
+    parser.add_argument('--task', help='任务名称（使用 databases/<task>.db）')
+    parser.add_argument('--db', help='数据库路径')
+    parser.add_argument('--cache-dir', default=str(project_root / 'cache' / 'images'), help='图片缓存目录')
+    parser.add_argument('--max-size', type=int, default=1024, help='显示版本的最长边（像素），需与服务启动参数一致')
+    parser.add_argument('--cache-mb', type=int, default=2048, help='缓存大小上限（MB）')
+    parser.add_argument('--workers', type=int, default=8, help='并行线程数')
+
+    args = parser.parse_args()
+
+    if args.db:
+        db_path = args.db
+    elif args.task:
+        db_path = str(project_root / 'databases' / f'{args.task}.db')
+    else:
+        parser.error("请指定 --task 或 --db")
+
+    warm_cache(db_path, args.cache_dir, args.max_size, args.cache_mb, args.workers)